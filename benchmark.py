@@ -0,0 +1,348 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Table sizes seeded by default
+SIZES = (1000, 100000, 1000000)
+
+# Timed repetitions for quick operations, and for operations that read a whole table
+ITERATIONS = 100
+FULL_ITERATIONS = 3
+
+# Items changed per call by the bulk benchmarks
+BULK_SIZE = 1000
+
+# Longest wait for a page to fill in the UI benchmarks
+UI_TIMEOUT = 120
+
+# A result is a regression when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 0.2
+
+
+# Summary of one operation's timings, in milliseconds
+def summarize(size, operation, samples, rows=None):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    result = {
+        "size": size,
+        "operation": operation,
+        "iterations": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(samples_ms[len(samples_ms) // 2], 3),
+        "p95_ms": round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 3),
+        "min_ms": round(samples_ms[0], 3),
+        "max_ms": round(samples_ms[-1], 3),
+        "ops_per_s": round(len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+    if rows is not None:
+        result["rows"] = rows
+        result["rows_per_s"] = round(rows * len(samples) / sum(samples)) if sum(samples) else None
+    return result
+
+
+# Runs func(i) iterations times and returns the summary; func may return a row count
+def measure(size, operation, func, iterations):
+    samples = []
+    rows = None
+    for i in range(iterations):
+        started = time.perf_counter()
+        result = func(i)
+        samples.append(time.perf_counter() - started)
+        if isinstance(result, int):
+            rows = result
+    print(f"  {operation:<32} {statistics.fmean(samples) * 1000:10.2f} ms mean", file=sys.stderr)
+    return summarize(size, operation, samples, rows)
+
+
+# db.py mutations report failures as messages, which must not be timed as successes
+def expect(outcome, message):
+    result, row = outcome
+    if not result.endswith(message):
+        raise RuntimeError(f"Benchmark operation failed: {result}")
+    return row
+
+
+# Replaces every table's contents with size items and one ledger entry per item,
+# spread over the last year so the ledger spans thirteen monthly partitions
+def seed(size):
+    from db_pool import connection
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            TRUNCATE inventory, ledger, category_stock, daily_movement, inventory_snapshot_items,
+                     inventory_snapshots, sync_applied RESTART IDENTITY
+            """
+        )
+        cur.execute("UPDATE report_state SET last_ledger_id = 0, ledger_gaps = '{}'")
+        cur.execute(
+            """
+            SELECT create_ledger_partition((date_trunc('month', CURRENT_DATE) - make_interval(months => m))::date)
+            FROM generate_series(0, 12) AS m
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO inventory (name, category, quantity, price, date_added)
+            SELECT 'item-' || n, 'cat' || (n %% 20), 10 + n %% 90, ((n %% 5000) + 1) / 100.0,
+                   CURRENT_TIMESTAMP - make_interval(days => n %% 365)
+            FROM generate_series(1, %s) AS n
+            """,
+            (size,),
+        )
+        cur.execute(
+            """
+            INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price, timestamp)
+            SELECT 'INSERT', id, name, category, NULL, quantity, NULL, price, date_added FROM inventory
+            """
+        )
+    with connection() as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE inventory")
+            cur.execute("VACUUM ANALYZE ledger")
+        conn.autocommit = False
+
+
+# Latency and throughput of every db.py operation at one table size
+def benchmark_database(size, iterations, full_iterations):
+    import db
+    from repository import InventoryRepository
+    repository = InventoryRepository()
+    rng = random.Random(size)
+    results = []
+
+    def random_id():
+        return rng.randint(1, size)
+
+    # Reads
+    results.append(measure(size, "fetch_inventory", lambda i: len(db.fetch_inventory()), full_iterations))
+    results.append(measure(size, "fetch_ledger", lambda i: len(db.fetch_ledger()), full_iterations))
+    results.append(measure(size, "fetch_inventory_page.first", lambda i: len(db.fetch_inventory_page(0)), iterations))
+    results.append(measure(size, "fetch_inventory_page.middle", lambda i: len(db.fetch_inventory_page(size // 2)), iterations))
+    results.append(measure(size, "fetch_ledger_page.first", lambda i: len(db.fetch_ledger_page(0)), iterations))
+    results.append(measure(size, "fetch_ledger_page.middle", lambda i: len(db.fetch_ledger_page(size // 2)), iterations))
+    results.append(measure(size, "fetch_inventory_rows.100", lambda i: len(db.fetch_inventory_rows([random_id() for _ in range(100)])), iterations))
+
+    month_start = (datetime.now().replace(day=1) - timedelta(days=95)).replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    results.append(measure(size, "fetch_ledger.one_month", lambda i: len(db.fetch_ledger(month_start, month_end)), full_iterations))
+    results.append(measure(size, "stream_ledger", lambda i: sum(1 for _ in db.stream_ledger()), full_iterations))
+    results.append(measure(size, "copy_ledger_csv", lambda i: db.copy_ledger_csv(io.StringIO()), full_iterations))
+
+    # Single-item mutations
+    added = []
+    def add(i):
+        added.append(expect(db.add_inventory_item(f"bench-{size}-{i}", "bench", 10, 1.5), "Item added successfully!")[0])
+    results.append(measure(size, "add_inventory_item", add, iterations))
+
+    def update(i):
+        item_id = random_id()
+        expect(db.update_inventory_item(item_id, f"item-{item_id}", "cat-updated", 50, 2.5), "Item updated successfully!")
+    results.append(measure(size, "update_inventory_item", update, iterations))
+
+    results.append(measure(size, "adjust_stock", lambda i: expect(db.adjust_stock(random_id(), 1, "bench"), "Stock adjusted successfully!"), iterations))
+    results.append(measure(size, "delete_inventory_item", lambda i: expect(db.delete_inventory_item(added[i]), "Item deleted successfully!"), iterations))
+
+    # Bulk paths, BULK_SIZE items per call
+    bulk_iterations = max(1, min(iterations // 10, 10))
+    batches = [rng.sample(range(1, size + 1), min(BULK_SIZE, size)) for _ in range(bulk_iterations)]
+    results.append(measure(size, f"bulk_update_items.{BULK_SIZE}", lambda i: len(expect(
+        db.bulk_update_items([(item_id, "cat-bulk", 3.0) for item_id in batches[i]]), "items updated successfully!")), bulk_iterations))
+    results.append(measure(size, f"bulk_change_price_percent.{BULK_SIZE}", lambda i: len(expect(
+        db.bulk_change_price_percent(batches[i], 5), "items repriced successfully!")), bulk_iterations))
+    results.append(measure(size, f"adjust_many.{BULK_SIZE}", lambda i: len(
+        repository.adjust_many([(item_id, 1, "bench") for item_id in batches[i]])), bulk_iterations))
+    results.append(measure(size, f"add_many.{BULK_SIZE}", lambda i: len(
+        repository.add_many([(f"bench-bulk-{size}-{i}-{n}", "bench", 5, 1.0) for n in range(BULK_SIZE)])), bulk_iterations))
+    results.append(measure(size, f"bulk_delete_items.{BULK_SIZE}", lambda i: len(expect(
+        db.bulk_delete_items(batches[i]), "items deleted successfully!")), bulk_iterations))
+
+    return results
+
+
+# Starts a virtual display when none is available, returns it (to stop later) or None.
+# Raises RuntimeError when there is no display and no way to make one.
+def start_virtual_display():
+    if os.environ.get("DISPLAY"):
+        return None
+    try:
+        from pyvirtualdisplay import Display
+    except ImportError:
+        raise RuntimeError("no DISPLAY and pyvirtualdisplay is not installed (pip install pyvirtualdisplay, needs Xvfb)")
+    display = Display(visible=False, size=(1920, 1080))
+    display.start()
+    return display
+
+
+# Pumps the Tk event loop until another ui_render_seconds sample is recorded for table,
+# i.e. the next page has been drawn
+def wait_for_render(root, table, count):
+    from metrics import metrics
+    deadline = time.perf_counter() + UI_TIMEOUT
+    while time.perf_counter() < deadline:
+        root.update()
+        histograms, _, _ = metrics.snapshot()
+        histogram = histograms.get(("ui_render_seconds", (("table", table),)))
+        if histogram and histogram.count > count:
+            return histogram.count
+        time.sleep(0.001)
+    raise RuntimeError(f"Timed out waiting for {table} to render")
+
+
+def render_count(table):
+    from metrics import metrics
+    histograms, _, _ = metrics.snapshot()
+    histogram = histograms.get(("ui_render_seconds", (("table", table),)))
+    return histogram.count if histogram else 0
+
+
+# Time from building InventoryPage/LedgerPage until their first page is on screen
+def benchmark_ui(size, iterations):
+    import tkinter as tk
+    import db
+    from worker import DbWorker
+    from listener import ChangeListener
+    from inventory_page import InventoryPage
+    from ledger_page import LedgerPage
+
+    # Just enough of main.App for the pages: no listener thread, sync or background jobs
+    class Controller(tk.Tk):
+        def __init__(self):
+            super().__init__()
+            self.geometry("1600x1000")
+            self.worker = DbWorker(self)
+            self.listener = ChangeListener(self)
+            self.data = db
+
+        def show_frame(self, page):
+            pass
+
+        def mark_startup(self, milestone):
+            pass
+
+        def open_diagnostics(self):
+            pass
+
+    root = Controller()
+    results = []
+    try:
+        for page_class, table, operation in ((InventoryPage, "inventory.view", "InventoryPage.fill"),
+                                             (LedgerPage, "ledger.load", "LedgerPage.fill")):
+            samples = []
+            for _ in range(iterations):
+                count = render_count(table)
+                started = time.perf_counter()
+                page = page_class(root, root)
+                page.pack(fill="both", expand=True)
+                page.tkraise()
+                wait_for_render(root, table, count)
+                samples.append(time.perf_counter() - started)
+                page.destroy()
+            print(f"  {operation:<32} {statistics.fmean(samples) * 1000:10.2f} ms mean", file=sys.stderr)
+            results.append(summarize(size, operation, samples))
+    finally:
+        root.worker.shutdown()
+        root.destroy()
+    return results
+
+
+# Where and on what the benchmark ran, so results from different machines aren't compared blindly
+def environment():
+    from db_pool import connection
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "postgres": server_version,
+    }
+
+
+# Compares results with a baseline file, returns the operations that got slower than allowed
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(row["size"], row["operation"]): row for row in json.load(file)["results"]}
+
+    regressions = []
+    for row in results:
+        before = baseline.get((row["size"], row["operation"]))
+        if not before or not before["p50_ms"]:
+            continue
+        change = row["p50_ms"] / before["p50_ms"] - 1
+        print(f"{row['size']:>8} {row['operation']:<32} {before['p50_ms']:10.2f} -> {row['p50_ms']:10.2f} ms ({change:+.0%})", file=sys.stderr)
+        if change > threshold:
+            regressions.append((row["size"], row["operation"], change))
+    return regressions
+
+
+# Run the script against a disposable local database, e.g.
+# python benchmark.py --dsn postgresql://localhost/inventory_bench --sizes 1000,100000 --output results.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark database operations and table rendering. Wipes every table in the target database!")
+    parser.add_argument("--dsn", default=os.getenv("BENCHMARK_DATABASE_URL"), help="database to benchmark (default: BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated row counts to seed")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--full-iterations", type=int, default=FULL_ITERATIONS, help="repetitions of whole-table reads")
+    parser.add_argument("--ui", action="store_true", help="also time InventoryPage/LedgerPage fill (needs a display or pyvirtualdisplay)")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with earlier JSON results, exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("a disposable database is required: pass --dsn or set BENCHMARK_DATABASE_URL")
+
+    # db_pool reads DATABASE_URL on import, so point it at the benchmark database first
+    os.environ["DATABASE_URL"] = args.dsn
+    from migrations import apply_migrations
+    apply_migrations()
+
+    report = {"environment": environment(), "results": [], "skipped": []}
+    display = None
+    if args.ui:
+        try:
+            display = start_virtual_display()
+        except RuntimeError as e:
+            report["skipped"].append({"operation": "ui", "reason": str(e)})
+            args.ui = False
+
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            print(f"Seeding {size} rows...", file=sys.stderr)
+            started = time.perf_counter()
+            seed(size)
+            report["results"].append(summarize(size, "seed", [time.perf_counter() - started], rows=size))
+
+            report["results"].extend(benchmark_database(size, args.iterations, args.full_iterations))
+            if args.ui:
+                report["results"].extend(benchmark_ui(size, max(1, args.full_iterations)))
+    finally:
+        if display is not None:
+            display.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(report["results"], args.compare, args.threshold)
+        for size, operation, change in regressions:
+            print(f"Regression: {operation} at {size} rows is {change:+.0%} slower", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,85 @@
+import argparse
+import json
+import time
+from datetime import datetime
+from db import copy_inventory_csv, copy_ledger_csv, stream_inventory, stream_ledger
+
+# Column names in table order, used as JSON keys
+INVENTORY_COLUMNS = ("id", "name", "category", "quantity", "price", "date_added", "version")
+LEDGER_COLUMNS = ("id", "operation_type", "item_name", "category", "previous_quantity",
+                  "new_quantity", "previous_price", "new_price", "timestamp", "reason", "item_id")
+
+# Supported output formats
+FORMATS = ("csv", "jsonl")
+
+
+# Picks the output format from the file extension
+def format_for_path(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv"
+
+
+# Makes Decimal and datetime values JSON friendly
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+
+# Writes streamed rows as JSON Lines, one object per row, and returns the row count
+def _write_jsonl(file, columns, rows):
+    count = 0
+    for row in rows:
+        file.write(json.dumps({col: _json_value(value) for col, value in zip(columns, row)}))
+        file.write("\n")
+        count += 1
+    return count
+
+
+# Exports the inventory table. CSV goes straight from COPY to the file and JSON Lines
+# comes through a server-side cursor, so memory use stays flat either way.
+def export_inventory(path, fmt=None):
+    fmt = fmt or format_for_path(path)
+    started = time.perf_counter()
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            count = copy_inventory_csv(file)
+        else:
+            count = _write_jsonl(file, INVENTORY_COLUMNS, stream_inventory())
+
+    return count, time.perf_counter() - started
+
+
+# Exports the ledger, optionally limited to [start, end) and to some operation types
+def export_ledger(path, fmt=None, start=None, end=None, operations=None):
+    fmt = fmt or format_for_path(path)
+    started = time.perf_counter()
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            count = copy_ledger_csv(file, start, end, operations)
+        else:
+            count = _write_jsonl(file, LEDGER_COLUMNS, stream_ledger(start=start, end=end, operations=operations))
+
+    return count, time.perf_counter() - started
+
+
+# Run the script to export a table from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export inventory or ledger rows to CSV or JSON Lines.")
+    parser.add_argument("table", choices=("inventory", "ledger"), help="table to export")
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--format", choices=FORMATS, help="output format (default: from the file extension)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="ledger only: first timestamp to include (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="ledger only: timestamp to stop before")
+    parser.add_argument("--operation", action="append", choices=("INSERT", "UPDATE", "DELETE"), help="ledger only: operation type to include, can be repeated")
+    args = parser.parse_args()
+
+    if args.table == "inventory":
+        count, seconds = export_inventory(args.path, args.format)
+    else:
+        count, seconds = export_ledger(args.path, args.format, args.start, args.end, args.operation)
+
+    print(f"Exported {count} {args.table} rows to {args.path} in {seconds:.2f}s")
@@ -0,0 +1,143 @@
+import argparse
+import csv
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from db import insert_inventory_batch
+from db_pool import connection
+from repository import validate_new_item
+
+# Columns every import file must have
+REQUIRED_COLUMNS = ("name", "category", "quantity", "price")
+
+# Rows validated and inserted per statement
+BATCH_SIZE = 1000
+
+# What the inventory columns can hold, checked per row so one oversized value rejects only its
+# own row instead of aborting the whole import
+NAME_MAX_LENGTH = 100
+CATEGORY_MAX_LENGTH = 50
+QUANTITY_MAX = 2 ** 31 - 1
+PRICE_MAX = Decimal("99999999.99")
+CENT = Decimal("0.01")
+
+
+# Outcome of an import: how many rows went in and which ones were rejected
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.rejects = []
+        self.seconds = 0.0
+
+    # Records a rejected row by its line number in the file
+    def reject(self, line_number, name, reason):
+        self.rejects.append((line_number, name, reason))
+
+    def rows_per_second(self):
+        total = self.inserted + len(self.rejects)
+        return total / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"Imported {self.inserted} items, rejected {len(self.rejects)} "
+                f"in {self.seconds:.2f}s ({self.rows_per_second():.0f} rows/s)")
+
+
+# Parses and validates one CSV record, returns (values, None) or (None, error message)
+def parse_row(record):
+    name = (record.get("name") or "").strip()
+    category = (record.get("category") or "").strip()
+
+    if not name or not category:
+        return None, "Name and category are required!"
+    if len(name) > NAME_MAX_LENGTH:
+        return None, f"Name must be at most {NAME_MAX_LENGTH} characters!"
+    if len(category) > CATEGORY_MAX_LENGTH:
+        return None, f"Category must be at most {CATEGORY_MAX_LENGTH} characters!"
+
+    try:
+        quantity = int((record.get("quantity") or "").strip())
+        price = Decimal((record.get("price") or "").strip())
+    except (ValueError, InvalidOperation):
+        return None, "Please enter valid values!"
+    if not price.is_finite():
+        return None, "Please enter valid values!"
+
+    # Same quantity and price rules as add_inventory_item
+    error = validate_new_item(quantity, price)
+    if error:
+        return None, error
+
+    if quantity > QUANTITY_MAX:
+        return None, f"Quantity must be at most {QUANTITY_MAX}!"
+
+    # Prices are stored rounded to cents
+    if price > PRICE_MAX or price.quantize(CENT, rounding=ROUND_HALF_UP) > PRICE_MAX:
+        return None, f"Price must be at most {PRICE_MAX}!"
+
+    return (name, category, quantity, price), None
+
+
+# Reads the CSV lazily and yields batches of (line_number, values) that passed validation.
+# Rows that fail validation or repeat a name seen earlier in the file are rejected on the way.
+def read_batches(csv_file, result, batch_size=BATCH_SIZE):
+    reader = csv.DictReader(csv_file)
+
+    missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Import file is missing columns: {', '.join(missing)}")
+
+    seen_names = set()
+    batch = []
+    for record in reader:
+        line_number = reader.line_num
+        values, error = parse_row(record)
+
+        if error:
+            result.reject(line_number, record.get("name"), error)
+            continue
+
+        if values[0] in seen_names:
+            result.reject(line_number, values[0], "Duplicate name in import file!")
+            continue
+        seen_names.add(values[0])
+
+        batch.append((line_number, values))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+# Imports inventory from a CSV file in a single transaction.
+# Either every valid row is committed together or, on a database error, none are.
+def import_inventory_csv(path, batch_size=BATCH_SIZE):
+    result = ImportResult()
+    started = time.perf_counter()
+
+    with open(path, newline="", encoding="utf-8-sig") as csv_file, connection() as conn, conn.cursor() as cur:
+        for batch in read_batches(csv_file, result, batch_size):
+            inserted = insert_inventory_batch(cur, [values for _, values in batch])
+            result.inserted += len(inserted)
+
+            # Anything the database skipped clashed with an existing item name
+            for line_number, values in batch:
+                if values[0] not in inserted:
+                    result.reject(line_number, values[0], "Item with this name already exists!")
+
+    result.rejects.sort()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+# Run the script to import a CSV file from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import inventory items from a CSV file with name, category, quantity and price columns.")
+    parser.add_argument("path", help="CSV file to import")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows inserted per statement")
+    args = parser.parse_args()
+
+    result = import_inventory_csv(args.path, args.batch_size)
+    for line_number, name, reason in result.rejects:
+        print(f"Line {line_number} ({name}): {reason}")
+    print(result.summary())
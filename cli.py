@@ -0,0 +1,121 @@
+import argparse
+import csv
+import json
+import sys
+from decimal import Decimal
+import psycopg2
+from repository import InventoryRepository, InventoryError
+
+# Adjustments sent to the database per statement by adjust-many
+ADJUST_BATCH_SIZE = 1000
+
+
+# Prints items as tab-separated values or JSON Lines
+def print_items(items, as_json=False):
+    for item in items:
+        if as_json:
+            print(json.dumps({field: value if isinstance(value, (int, str)) or value is None else str(value)
+                              for field, value in item._asdict().items()}))
+        else:
+            print("\t".join(str(value) for value in item))
+
+
+# Reads (item_id, delta, reason) rows from a CSV with id,delta[,reason] columns
+def read_adjustments(csv_file):
+    reader = csv.DictReader(csv_file)
+    for record in reader:
+        if record.get("id") is None or record.get("delta") is None:
+            raise ValueError(f"Line {reader.line_num}: id and delta are required")
+        yield int(record["id"]), int(record["delta"]), record.get("reason") or None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Inventory operations from the command line.")
+    parser.add_argument("--json", action="store_true", help="print items as JSON Lines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add an item")
+    add.add_argument("name")
+    add.add_argument("category")
+    add.add_argument("quantity", type=int)
+    add.add_argument("price", type=Decimal)
+
+    update = commands.add_parser("update", help="replace an item's fields")
+    update.add_argument("id", type=int)
+    update.add_argument("name")
+    update.add_argument("category")
+    update.add_argument("quantity", type=int)
+    update.add_argument("price", type=Decimal)
+    update.add_argument("--expected-version", type=int, help="only update if the item is still at this version")
+
+    delete = commands.add_parser("delete", help="delete one or more items")
+    delete.add_argument("ids", type=int, nargs="+")
+
+    adjust = commands.add_parser("adjust", help="receive (+) or pick (-) stock")
+    adjust.add_argument("id", type=int)
+    adjust.add_argument("delta", type=int)
+    adjust.add_argument("--reason")
+
+    adjust_many = commands.add_parser("adjust-many", help="apply adjustments from a CSV with id,delta[,reason] columns")
+    adjust_many.add_argument("file", help="CSV file, or - for stdin")
+    adjust_many.add_argument("--batch-size", type=int, default=ADJUST_BATCH_SIZE)
+
+    list_items = commands.add_parser("list", help="list items ordered by id")
+    list_items.add_argument("--after-id", type=int, default=0)
+    list_items.add_argument("--limit", type=int, default=200)
+
+    export = commands.add_parser("export", help="export the inventory or ledger to CSV or JSON Lines")
+    export.add_argument("table", choices=("inventory", "ledger"))
+    export.add_argument("path")
+    return parser
+
+
+# Runs one command and returns the process exit code
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repository = InventoryRepository()
+
+    try:
+        if args.command == "add":
+            print_items([repository.add(args.name, args.category, args.quantity, args.price)], args.json)
+        elif args.command == "update":
+            item = repository.update(args.id, args.name, args.category, args.quantity, args.price, args.expected_version)
+            print_items([item], args.json)
+        elif args.command == "delete":
+            deleted = repository.delete_many(args.ids)
+            print(f"Deleted {len(deleted)} of {len(args.ids)} items", file=sys.stderr)
+        elif args.command == "adjust":
+            print_items([repository.adjust(args.id, args.delta, args.reason)], args.json)
+        elif args.command == "adjust-many":
+            csv_file = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+            with csv_file:
+                # Each batch is all or nothing; batches before a failed one stay applied
+                batch = []
+                count = 0
+                for adjustment in read_adjustments(csv_file):
+                    batch.append(adjustment)
+                    if len(batch) >= args.batch_size:
+                        count += len(repository.adjust_many(batch))
+                        batch = []
+                count += len(repository.adjust_many(batch))
+            print(f"Adjusted {count} items", file=sys.stderr)
+        elif args.command == "list":
+            print_items(repository.list_items(args.after_id, args.limit), args.json)
+        else:
+            # Imported here so the other commands start without loading it
+            from bulk_export import export_inventory, export_ledger, format_for_path
+            export = export_inventory if args.table == "inventory" else export_ledger
+            count, seconds = export(args.path, format_for_path(args.path))
+            print(f"Exported {count} {args.table} rows to {args.path} in {seconds:.2f}s", file=sys.stderr)
+
+    # Database, file and input errors are reported the same way instead of as a traceback
+    except (InventoryError, psycopg2.Error, OSError, ValueError) as e:
+        print(f"Error: {str(e).strip()}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+# Run the script for scripted or automated use, e.g. python cli.py adjust 42 -5 --reason "order 1001"
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,23 @@
-import psycopg2
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Connect to PostgreSQL with environment variable
-DB_URL = os.getenv("DATABASE_URL")  
+from db_pool import connection
+from ledger_watermark import LedgerWatermark
+from metrics import timed
+from migrations import apply_migrations
+from repository import (
+    InventoryRepository, InventoryError, ItemNotFound, insert_items,
+)
 
 # Get all data from inventory
+@timed
 def fetch_inventory():
 
-    # Connect to PostgreSQL
+    # Borrow a pooled connection
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-        
-        # SQL query 
-        cur.execute("SELECT * FROM inventory")
-        rows = cur.fetchall()  
-
-        # Closes resources 
-        cur.close()
-        conn.close()
-        
+        with connection() as conn, conn.cursor() as cur:
+
+            # SQL query 
+            cur.execute("SELECT * FROM inventory")
+            rows = cur.fetchall()  
+
         # Return the query data 
         return rows  
 
@@ -32,20 +26,18 @@ def fetch_inventory():
         print(f"Error fetching inventory: {e}")
         return []
 
-# Get all data from ledger   
-def fetch_ledger():
+# Get all data from ledger, optionally only between start (inclusive) and end (exclusive).
+# The ledger is partitioned by month, so a date range only reads the months it covers.
+@timed
+def fetch_ledger(start=None, end=None):
+    where, params = _ledger_filter(start, end)
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-        
-        # SQL query
-        cur.execute("SELECT * FROM ledger")
-        rows = cur.fetchall()  
+        with connection() as conn, conn.cursor() as cur:
+
+            # SQL query
+            cur.execute(f"SELECT * FROM ledger{where}", params)
+            rows = cur.fetchall()  
 
-        # Closes resources
-        cur.close()
-        conn.close()
-        
         # Return the query data
         return rows  
 
@@ -54,184 +46,296 @@ def fetch_ledger():
         print(f"Error fetching ledger: {e}")
         return []
 
+# Number of rows fetched per page by the paginated fetches
+PAGE_SIZE = 200
+
+# Number of rows pulled per network round trip by the streaming fetches
+STREAM_BATCH_SIZE = 2000
+
+# Get one page of inventory ordered by id, starting after the given id (keyset pagination)
+@timed
+def fetch_inventory_page(after_id=0, limit=PAGE_SIZE):
+    try:
+        with connection() as conn, conn.cursor() as cur:
+
+            # SQL query, uses the primary key index so every page costs the same
+            cur.execute("SELECT * FROM inventory WHERE id > %s ORDER BY id LIMIT %s", (after_id, limit))
+            rows = cur.fetchall()
+
+        # Return the query data
+        return rows
+
+    # Error handling
+    except Exception as e:
+        print(f"Error fetching inventory page: {e}")
+        return []
+
+# Get one page of ledger ordered by id, starting after the given id (keyset pagination).
+# Takes the same optional date range as fetch_ledger. Errors are raised rather than
+# returned as [], which would look like the end of the ledger.
+@timed
+def fetch_ledger_page(after_id=0, limit=PAGE_SIZE, start=None, end=None):
+    where, params = _ledger_filter(start, end, after_id=after_id)
+    with connection() as conn, conn.cursor() as cur:
+
+        # SQL query, uses each partition's primary key index so every page costs the same
+        cur.execute(f"SELECT * FROM ledger{where} ORDER BY id LIMIT %s", params + [limit])
+        rows = cur.fetchall()
+
+    # Return the query data
+    return rows
+
+# Reads the ledger entries a LedgerWatermark is waiting for on an open cursor: the missing
+# ids it remembers and up to limit entries above its highest id, ordered by id. The snapshot
+# bounds come from the same statement, so they describe exactly what the rows were read with.
+# Returns (rows, snapshot_xmin, snapshot_xmax).
+def read_ledger_tail(cur, watermark, limit, columns="tail.*"):
+    cur.execute(
+        f"""
+        WITH snapshot AS (
+            SELECT pg_snapshot_xmin(s)::text::bigint AS xmin, pg_snapshot_xmax(s)::text::bigint AS xmax
+            FROM pg_current_snapshot() AS s
+        )
+        SELECT snapshot.xmin, snapshot.xmax, {columns}
+        FROM snapshot LEFT JOIN LATERAL (
+            (SELECT * FROM ledger WHERE id = ANY(%s))
+            UNION ALL
+            (SELECT * FROM ledger WHERE id > %s ORDER BY id LIMIT %s)
+        ) AS tail ON true
+        ORDER BY tail.id
+        """,
+        (list(watermark.gaps), watermark.high, limit),
+    )
+    rows = cur.fetchall()
+    snapshot_xmin, snapshot_xmax = rows[0][:2]
+    return [row[2:] for row in rows if row[2] is not None], snapshot_xmin, snapshot_xmax
+
+# Get the ledger entries after a LedgerWatermark (None to start from the beginning), including
+# entries that committed after higher ids were already read. Returns (rows, watermark, removed_ids)
+# like LocalStore.fetch_ledger_tail; PostgreSQL never takes an entry back, so removed_ids is empty.
+# Errors are raised so the caller retries from the same watermark instead of skipping entries.
+@timed
+def fetch_ledger_tail(cursor=None, limit=PAGE_SIZE):
+    watermark = cursor or LedgerWatermark()
+    with connection() as conn, conn.cursor() as cur:
+        rows, snapshot_xmin, snapshot_xmax = read_ledger_tail(cur, watermark, limit)
+    return rows, watermark.advance([row[0] for row in rows], snapshot_xmin, snapshot_xmax), ()
+
+# Get the current inventory rows for a set of ids; ids missing from the result were deleted.
+# Errors are raised rather than returned as [], which would look like every item was deleted.
+@timed
+def fetch_inventory_rows(item_ids):
+    with connection() as conn, conn.cursor() as cur:
+
+        # SQL query
+        cur.execute("SELECT * FROM inventory WHERE id = ANY(%s)", (list(item_ids),))
+        rows = cur.fetchall()
+
+    # Return the query data
+    return rows
+
+# Stream rows of a query through a server-side cursor so only one batch is held in memory.
+# The pooled connection stays checked out until the generator is exhausted or closed.
+def _stream_rows(name, query, params=(), batch_size=STREAM_BATCH_SIZE):
+    with connection() as conn, conn.cursor(name=name) as cur:
+        cur.itersize = batch_size
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+
+# Stream all inventory rows ordered by id
+def stream_inventory(batch_size=STREAM_BATCH_SIZE):
+    return _stream_rows("inventory_stream", "SELECT * FROM inventory ORDER BY id", batch_size=batch_size)
+
+# Builds the WHERE clause for optional ledger filters.
+# start is inclusive, end is exclusive and operations is a list of operation types.
+# Conditions on timestamp are left bare so PostgreSQL can skip partitions outside the range.
+def _ledger_filter(start=None, end=None, operations=None, after_id=None):
+    conditions = []
+    params = []
+    if after_id is not None:
+        conditions.append("id > %s")
+        params.append(after_id)
+    if start is not None:
+        conditions.append("timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp < %s")
+        params.append(end)
+    if operations:
+        conditions.append("operation_type = ANY(%s)")
+        params.append(list(operations))
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+# Stream ledger rows ordered by id, optionally filtered by date range and operation type
+def stream_ledger(batch_size=STREAM_BATCH_SIZE, start=None, end=None, operations=None):
+    where, params = _ledger_filter(start, end, operations)
+    return _stream_rows("ledger_stream", f"SELECT * FROM ledger{where} ORDER BY id", params, batch_size)
+
+# Copy all inventory rows as CSV (with a header) straight into a file object, returns the row count
+@timed
+def copy_inventory_csv(file):
+    with connection() as conn, conn.cursor() as cur:
+        cur.copy_expert("COPY (SELECT * FROM inventory ORDER BY id) TO STDOUT WITH CSV HEADER", file)
+        return cur.rowcount
+
+# Copy ledger rows as CSV (with a header) straight into a file object, returns the row count.
+# Takes the same filters as stream_ledger.
+@timed
+def copy_ledger_csv(file, start=None, end=None, operations=None):
+    where, params = _ledger_filter(start, end, operations)
+    with connection() as conn, conn.cursor() as cur:
+
+        # COPY can't take bind parameters, so the query is rendered safely first
+        query = cur.mogrify(f"SELECT * FROM ledger{where} ORDER BY id", params).decode()
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", file)
+        return cur.rowcount
+
+# Mutations return a (message, row) pair. The row is the affected inventory row
+# as written to the database (or as it was before a delete), or None on failure,
+# so callers can patch a single table row instead of reloading everything.
+#
+# The work is done by InventoryRepository (see repository.py); these wrappers turn
+# its results and exceptions into the messages the pages show.
+repository = InventoryRepository()
+
 # Add item to inventory   
+@timed
 def add_inventory_item(name, category, quantity, price):
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-
-        # Checks to see if item name already exists to prevent duplicate data
-        cur.execute("SELECT COUNT(*) FROM inventory WHERE name = %s", (name,))
-        count = cur.fetchone()[0]
-
-        # Validation handling for an item with same name
-        if count > 0:
-            return "Item with this name already exists!"
-        
-        # Validation for quantity
-        if quantity <= 0:
-            return "Quantity must be greater than 0!"
-        
-        # Validation for price
-        if price <= 0:
-            return "Price must be greater than 0!"
-
-        # Adds item to db
-        cur.execute(
-            """
-            INSERT INTO inventory (name, category, quantity, price) 
-            VALUES (%s, %s, %s, %s)
-            RETURNING id, quantity, price
-            """,
-            (name, category, quantity, price)
-        )
+        return "Item added successfully!", repository.add(name, category, quantity, price)
 
-        # Adds transaction to ledger
-        cur.execute(
-            """
-            INSERT INTO ledger (operation_type, item_name, category, previous_quantity, new_quantity, previous_price, new_price) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            ("INSERT", name, category, None, quantity, None, price)
-        )
+    # Validation handling, e.g. an item with the same name
+    except InventoryError as e:
+        return str(e), None
 
-        # Commit the changes and close the resources
-        conn.commit()
-        cur.close()
-        conn.close()
-        return "Item added successfully!"
-    
     # Error handling
     except Exception as e:
-        return f"Error adding item: {e}"
+        return f"Error adding item: {e}", None
 
-# Update item 
-def update_inventory_item(item_id, name, category, quantity, price):
+# Update item. When expected_version is given the update only applies if nobody has
+# changed the item since it was loaded (optimistic locking), so edits are never lost.
+@timed
+def update_inventory_item(item_id, name, category, quantity, price, expected_version=None):
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-
-        # Gets all the data from the requested item to update
-        cur.execute("SELECT * FROM inventory WHERE id = %s", (item_id,))
-        previous_entry = cur.fetchone()
-
-        #if there is no previous entry, it will create a new entry in ledger with old price/quantity as 0.
-        if not previous_entry:
-            cur.execute(
-                """
-                INSERT INTO ledger (operation_type, item_name, category, previous_quantity, new_quantity, previous_price, new_price) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                ("UPDATE", name, category, 0, quantity, 0, price)
-            )
-        else:
-            # If there is a previous entry, use the data from previous_entry and add that data to ledger
-            cur.execute(
-                """
-                INSERT INTO ledger (operation_type, item_name, category, previous_quantity, new_quantity, previous_price, new_price) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                ("UPDATE", name, category, previous_entry[3], quantity, previous_entry[4], price)
-            )
-
-        # Update inventory with new data
-        cur.execute(
-            """
-            UPDATE inventory 
-            SET name = %s, category = %s, quantity = %s, price = %s 
-            WHERE id = %s
-            """,
-            (name, category, quantity, price, item_id),
-        )
+        return "Item updated successfully!", repository.update(item_id, name, category, quantity, price, expected_version)
+
+    # Error handling for item not existing
+    except ItemNotFound as e:
+        return f"Error: {e}", None
+
+    # Validation handling, e.g. a version conflict
+    except InventoryError as e:
+        return str(e), None
+
+    # Error handling
+    except Exception as e:
+        return f"Error updating item: {e}", None
+
+# Receive (positive delta) or pick (negative delta) stock atomically
+@timed
+def adjust_stock(item_id, delta, reason=None):
+    try:
+        return "Stock adjusted successfully!", repository.adjust(item_id, delta, reason)
+
+    # Error handling for item not existing
+    except ItemNotFound as e:
+        return f"Error: {e}", None
+
+    # Validation handling, e.g. not enough stock
+    except InventoryError as e:
+        return str(e), None
 
-        # Commit the changes and close the resources
-        conn.commit()
-        cur.close()
-        conn.close()
-        return "Item updated successfully!"
-    
     # Error handling
     except Exception as e:
-        return f"Error updating item: {e}"
+        return f"Error adjusting stock: {e}", None
 
 # Delete Item
+@timed
 def delete_inventory_item(item_id):
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-
-        # Get the item to be deleted
-        cur.execute("SELECT * FROM inventory WHERE id = %s", (item_id,))
-        previous_entry = cur.fetchone()
-
-        # Error handling for item not existing
-        if not previous_entry:
-            return f"Error: Item with ID {item_id} does not exist."
-        
-        # Add a transaction to ledger
-        cur.execute(
-            """
-            INSERT INTO ledger (operation_type, item_name, category, previous_quantity, new_quantity, previous_price, new_price) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            ("DELETE", previous_entry[1], previous_entry[2], previous_entry[3], 0, previous_entry[4], 0)
-        )
+        return "Item deleted successfully!", repository.delete(item_id)
 
-        # Delete the item from inventory
-        cur.execute("DELETE FROM inventory WHERE id = %s", (item_id,))
+    # Error handling for item not existing
+    except ItemNotFound as e:
+        return f"Error: {e}", None
 
-        # Commit the changes and close reources
-        conn.commit()
-        cur.close()
-        conn.close()
-        return "Item deleted successfully!"
-    
     # Error handling
     except Exception as e:
-        return f"Error deleting item: {e}"
+        return f"Error deleting item: {e}", None
 
-# Create tables for db
-def create_tables():
-    commands = [
-        """
-        CREATE TABLE IF NOT EXISTS inventory (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            category VARCHAR(50) NOT NULL,
-            quantity INTEGER NOT NULL CHECK (quantity >= 0),
-            price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
-            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS ledger (
-            id SERIAL PRIMARY KEY,
-            operation_type VARCHAR(10) NOT NULL CHECK (operation_type IN ('INSERT', 'UPDATE', 'DELETE')),
-            item_name VARCHAR(100) NOT NULL,
-            category VARCHAR(50),
-            previous_quantity INTEGER,
-            new_quantity INTEGER,
-            previous_price DECIMAL(10,2),
-            new_price DECIMAL(10,2),
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-    ]
+# Bulk mutations take many item ids at once and change them with one set-based statement,
+# writing every matching ledger row in the same batch. They return (message, rows) with
+# the affected rows, like the single-item mutations.
+
+# Set the category and/or price of many items; changes is a list of (item_id, category, price)
+# where None keeps the current value
+@timed
+def bulk_update_items(changes):
+    if not changes:
+        return "No items selected!", []
 
-    # Connect to PostgreSQL and execute table creation
     try:
-        conn = psycopg2.connect(DB_URL)
-        cur = conn.cursor()
-        
-        # Execute the creating the table
-        for command in commands:
-            cur.execute(command)
-
-        # Commit the tables and close resources
-        conn.commit()
-        cur.close()
-        conn.close()
-        print("Tables created successfully!")
+        rows = repository.update_many(changes)
+        return f"{len(rows)} items updated successfully!", rows
+
+    # Validation handling
+    except InventoryError as e:
+        return str(e), []
+
+    # Error handling
+    except Exception as e:
+        return f"Error updating items: {e}", []
+
+# Change the price of many items by a percentage (e.g. 10 or -5), rounded to cents
+@timed
+def bulk_change_price_percent(item_ids, percent):
+    if not item_ids:
+        return "No items selected!", []
+
+    try:
+        rows = repository.change_price_percent(item_ids, percent)
+        return f"{len(rows)} items repriced successfully!", rows
+
+    # Validation handling
+    except InventoryError as e:
+        return str(e), []
+
+    # Error handling
+    except Exception as e:
+        return f"Error repricing items: {e}", []
+
+# Delete many items at once
+@timed
+def bulk_delete_items(item_ids):
+    if not item_ids:
+        return "No items selected!", []
+
+    try:
+        rows = repository.delete_many(item_ids)
+        return f"{len(rows)} items deleted successfully!", rows
+
+    # Error handling
+    except Exception as e:
+        return f"Error deleting items: {e}", []
+
+# Add a batch of already validated (name, category, quantity, price) rows on an open cursor.
+# Names that already exist are skipped; returns the set of names actually inserted.
+@timed
+def insert_inventory_batch(cur, rows):
+    return {item.name for item in insert_items(cur, rows)}
+
+# Create tables for db by applying any pending schema migrations (see migrations.py).
+# Safe to run repeatedly and against existing databases.
+def create_tables():
+    try:
+        applied = apply_migrations()
+        if applied:
+            print(f"Tables created successfully! Applied migrations: {applied}")
+        else:
+            print("Tables are up to date!")
 
     # Error handling
     except Exception as e:
@@ -239,4 +343,4 @@ def create_tables():
 
 # Run the script to create tables
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    create_tables()
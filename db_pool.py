@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from psycopg2 import pool, OperationalError, InterfaceError
+from psycopg2.extensions import connection as pg_connection, cursor as pg_cursor
+from dotenv import load_dotenv
+from metrics import metrics, SLOW_QUERY_MS
+
+# Load environment variables
+load_dotenv()
+
+# Connect to PostgreSQL with environment variable
+DB_URL = os.getenv("DATABASE_URL")
+
+# Pool settings (can be overridden in the .env file)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", "5"))
+
+# Connections idle for longer than this (seconds) are closed and replaced on checkout
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+
+# Connections idle for longer than this (seconds) are pinged before being handed out
+POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+
+# application_name of every pooled connection, unique per process, so change notifications
+# for writes this process made itself can be told apart (see listener.py)
+APPLICATION_NAME = f"inventory-{uuid.uuid4().hex[:12]}"
+
+
+# Cursor that records every statement: its latency, a round trip, the rows it returned or
+# changed, failures, and the SQL text of slow ones (see metrics.py)
+class InstrumentedCursor(pg_cursor):
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception:
+            metrics.increment("db_query_errors_total")
+            raise
+        finally:
+            self._record(started, query)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        except Exception:
+            metrics.increment("db_query_errors_total")
+            raise
+        finally:
+            self._record(started, query)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        except Exception:
+            metrics.increment("db_query_errors_total")
+            raise
+        finally:
+            self._record(started, sql)
+
+    # Server-side (named) cursors fetch rows in batches while being iterated,
+    # so their rows and round trips are counted as they arrive
+    def __iter__(self):
+        if self.name is None:
+            return super().__iter__()
+        return self._iter_named()
+
+    def _iter_named(self):
+        rows = 0
+        try:
+            while True:
+                try:
+                    row = pg_cursor.__next__(self)
+                except StopIteration:
+                    return
+                if rows % self.itersize == 0:
+                    metrics.increment("db_round_trips_total")
+                rows += 1
+                yield row
+        finally:
+            metrics.increment("db_rows_total", rows)
+
+    def _record(self, started, query):
+        seconds = time.perf_counter() - started
+        metrics.observe("db_query_seconds", seconds)
+        metrics.increment("db_round_trips_total")
+
+        # Named cursors only declare here, their rows are counted while iterating
+        if self.name is None and self.rowcount > 0:
+            metrics.increment("db_rows_total", self.rowcount)
+
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            sql = self.query.decode(errors="replace") if self.query else str(query)
+            metrics.slow_query(seconds, sql)
+
+
+# Connection that records how long connecting takes and hands out instrumented cursors
+class InstrumentedConnection(pg_connection):
+    def __init__(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            super().__init__(*args, **kwargs)
+        except Exception:
+            metrics.increment("db_connect_errors_total")
+            raise
+        metrics.observe("db_connect_seconds", time.perf_counter() - started)
+        self.cursor_factory = InstrumentedCursor
+
+
+class ConnectionPool:
+    def __init__(self, dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, health_check_after=POOL_HEALTH_CHECK_AFTER):
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._pool = pool.ThreadedConnectionPool(
+            min_size, max_size, dsn, connection_factory=InstrumentedConnection, application_name=APPLICATION_NAME,
+        )
+
+        # Blocks callers once every connection is checked out instead of raising PoolError
+        self._slots = threading.BoundedSemaphore(max_size)
+
+        # Time each pooled connection was last returned, keyed by id(conn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    # Returns True if the connection can be reused as-is
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+
+        # Connections that were just opened by the pool don't need checking
+        if last_used is None:
+            return True
+
+        idle = time.monotonic() - last_used
+
+        # Recycle connections that sat idle long enough for the server to drop them
+        if idle > self.idle_timeout:
+            return False
+
+        # Ping connections that have been idle for a while
+        if idle > self.health_check_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except (OperationalError, InterfaceError):
+                return False
+
+        return True
+
+    # Takes a healthy connection out of the pool, waiting if all are in use
+    def getconn(self, timeout=None):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            metrics.increment("db_pool_timeouts_total")
+            raise pool.PoolError("Timed out waiting for a database connection")
+
+        try:
+            while True:
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    # Time spent waiting for a free slot, reconnecting and health checking
+                    metrics.observe("db_pool_wait_seconds", time.perf_counter() - started)
+                    return conn
+
+                # Discard the stale connection and try again with a fresh one
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    # Returns a connection to the pool, closing it if it is broken
+    def putconn(self, conn, close=False):
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def closeall(self):
+        with self._lock:
+            self._last_used.clear()
+        self._pool.closeall()
+
+
+# Shared pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_URL)
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# Checks a connection out of the shared pool for the duration of a with block.
+# Commits on success, rolls back on error and always returns the connection.
+@contextmanager
+def connection():
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception as e:
+        broken = isinstance(e, (OperationalError, InterfaceError)) or conn.closed
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except (OperationalError, InterfaceError):
+                broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, close=broken)
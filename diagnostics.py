@@ -0,0 +1,107 @@
+import tkinter as tk
+from datetime import datetime
+from tkinter import messagebox, filedialog
+from paged_tree import create_scrolled_tree
+from metrics import metrics, METRICS_FILE
+
+# How often (ms) the open window refreshes its tables
+REFRESH_INTERVAL_MS = 1000
+
+
+# Live view of the app's metrics: latency histograms, counters and slow statements
+class DiagnosticsWindow(tk.Toplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Diagnostics")
+
+        # Buttons to dump and reset the metrics
+        button_frame = tk.Frame(self)
+        button_frame.pack(pady=10, padx=10, fill="x")
+        dump_button = tk.Button(button_frame, text="Dump Metrics", command=self.dump_metrics, bg="purple", fg="white", width=15)
+        dump_button.pack(side=tk.LEFT, padx=5)
+        reset_button = tk.Button(button_frame, text="Reset", command=self.reset_metrics, bg="gray", fg="white", width=15)
+        reset_button.pack(side=tk.LEFT, padx=5)
+
+        # Latency table
+        tk.Label(self, text="Latency (ms)", font=("Arial", 12)).pack(padx=10, anchor="w")
+        columns = ("Metric", "Labels", "Count", "Avg", "p50", "p95", "p99", "Max")
+        table_frame, self.latency_tree, scrollbar = create_scrolled_tree(self, columns, height=12)
+        scrollbar.configure(command=self.latency_tree.yview)
+        self.latency_tree.configure(yscrollcommand=scrollbar.set)
+        for col in columns:
+            self.latency_tree.heading(col, text=col)
+            self.latency_tree.column(col, width=220 if col in ("Metric", "Labels") else 80, anchor="center")
+        table_frame.pack(pady=5, padx=10, expand=True, fill="both")
+
+        # Counters table
+        tk.Label(self, text="Counters", font=("Arial", 12)).pack(padx=10, anchor="w")
+        columns = ("Counter", "Labels", "Value")
+        table_frame, self.counter_tree, scrollbar = create_scrolled_tree(self, columns, height=6)
+        scrollbar.configure(command=self.counter_tree.yview)
+        self.counter_tree.configure(yscrollcommand=scrollbar.set)
+        for col in columns:
+            self.counter_tree.heading(col, text=col)
+            self.counter_tree.column(col, width=220, anchor="center")
+        table_frame.pack(pady=5, padx=10, fill="x")
+
+        # Slow statements, newest first
+        tk.Label(self, text="Slow Queries", font=("Arial", 12)).pack(padx=10, anchor="w")
+        columns = ("Time", "ms", "SQL")
+        table_frame, self.slow_tree, scrollbar = create_scrolled_tree(self, columns, height=6)
+        scrollbar.configure(command=self.slow_tree.yview)
+        self.slow_tree.configure(yscrollcommand=scrollbar.set)
+        for col, width in zip(columns, (150, 80, 900)):
+            self.slow_tree.heading(col, text=col)
+            self.slow_tree.column(col, width=width, anchor="w" if col == "SQL" else "center")
+        table_frame.pack(pady=5, padx=10, fill="x")
+
+        self.after_id = None
+        self.refresh()
+
+    # Redraws every table from a snapshot of the metrics and schedules the next refresh
+    def refresh(self):
+        histograms, counters, slow_queries = metrics.snapshot()
+
+        self.latency_tree.delete(*self.latency_tree.get_children())
+        for (name, labels), histogram in sorted(histograms.items()):
+            self.latency_tree.insert("", tk.END, values=(
+                name, _format_labels(labels), histogram.count,
+                f"{histogram.total / histogram.count * 1000:.1f}" if histogram.count else "",
+                f"{histogram.quantile(0.5) * 1000:.1f}", f"{histogram.quantile(0.95) * 1000:.1f}",
+                f"{histogram.quantile(0.99) * 1000:.1f}", f"{histogram.max * 1000:.1f}",
+            ))
+
+        self.counter_tree.delete(*self.counter_tree.get_children())
+        for (name, labels), value in sorted(counters.items()):
+            self.counter_tree.insert("", tk.END, values=(name, _format_labels(labels), value))
+
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for logged_at, seconds, sql in reversed(slow_queries):
+            self.slow_tree.insert("", tk.END, values=(
+                datetime.fromtimestamp(logged_at).strftime("%H:%M:%S"), f"{seconds * 1000:.0f}", sql,
+            ))
+
+        self.after_id = self.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    # Writes the metrics in Prometheus text format, to METRICS_FILE if configured
+    def dump_metrics(self):
+        path = METRICS_FILE or filedialog.asksaveasfilename(
+            parent=self, title="Dump Metrics", defaultextension=".prom", filetypes=[("Prometheus text", "*.prom"), ("Text files", "*.txt")],
+        )
+        if not path:
+            return
+        metrics.dump(path)
+        messagebox.showinfo("Diagnostics", f"Metrics written to {path}", parent=self)
+
+    def reset_metrics(self):
+        metrics.reset()
+
+    def destroy(self):
+        if self.after_id is not None:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+        super().destroy()
+
+
+def _format_labels(labels):
+    return ", ".join(f"{key}={value}" for key, value in labels)
@@ -0,0 +1,146 @@
+from bisect import bisect_left, insort
+from operator import attrgetter
+
+# Columns the model can sort by, in table order
+COLUMNS = ("id", "name", "category", "quantity", "price", "date_added")
+
+
+# Sort key for a column. Empty values (e.g. a missing date_added) go after every other value
+# and ties are ordered by id, so every row has exactly one place in a sorted list.
+def sort_key(column):
+    value = attrgetter(column)
+
+    def key(row):
+        v = value(row)
+        return (v is None, v, row.id)
+    return key
+
+# Where row goes in rows, a list already sorted by column; it is at that index if it is in the list
+def sorted_index(rows, row, column, descending=False):
+    key = sort_key(column)
+    target = key(row)
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high) // 2
+        current = key(rows[middle])
+        if (current > target) if descending else (current < target):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# One inventory item. __slots__ keeps tens of thousands of these compact.
+# version is the row version used for optimistic locking of edits.
+class InventoryRow:
+    __slots__ = COLUMNS + ("version",)
+
+    def __init__(self, id, name, category, quantity, price, date_added, version=1):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.quantity = quantity
+        self.price = price
+        self.date_added = date_added
+        self.version = version
+
+    # Same shape as a row from the inventory table
+    def astuple(self):
+        return (self.id, self.name, self.category, self.quantity, self.price, self.date_added, self.version)
+
+
+# Client-side copy of the inventory table, keyed by id, with secondary indexes so
+# search, category filtering and re-sorting never need another database trip.
+class InventoryModel:
+    def __init__(self):
+        self.rows = {}
+
+        # Sorted (lowercase name, id) pairs for prefix search
+        self._names = []
+
+        # Category -> set of ids
+        self._categories = {}
+
+        # Cached sort orders, (column, descending) -> list of rows; kept in order on every change
+        self._sorted = {}
+
+    # Replaces the contents with rows from the database
+    def load(self, rows):
+        self.rows = {row[0]: InventoryRow(*row) for row in rows}
+        self._names = sorted((row.name.lower(), row.id) for row in self.rows.values())
+        self._categories = {}
+        for row in self.rows.values():
+            self._categories.setdefault(row.category, set()).add(row.id)
+        self._sorted = {}
+
+    # Adds or replaces a single row from the database
+    def upsert(self, row):
+        self.remove(row[0])
+        item = InventoryRow(*row)
+        self.rows[item.id] = item
+        insort(self._names, (item.name.lower(), item.id))
+        self._categories.setdefault(item.category, set()).add(item.id)
+        for (column, descending), rows in self._sorted.items():
+            rows.insert(sorted_index(rows, item, column, descending), item)
+
+    # Removes a row by id, if present
+    def remove(self, item_id):
+        item = self.rows.pop(item_id, None)
+        if item is None:
+            return
+
+        key = (item.name.lower(), item.id)
+        index = bisect_left(self._names, key)
+        if index < len(self._names) and self._names[index] == key:
+            del self._names[index]
+
+        ids = self._categories.get(item.category)
+        if ids is not None:
+            ids.discard(item.id)
+            if not ids:
+                del self._categories[item.category]
+
+        for (column, descending), rows in self._sorted.items():
+            index = sorted_index(rows, item, column, descending)
+            if index < len(rows) and rows[index] is item:
+                del rows[index]
+
+    def categories(self):
+        return sorted(self._categories)
+
+    # Ids of items whose name starts with prefix (case-insensitive), found by binary search
+    def ids_with_prefix(self, prefix):
+        prefix = prefix.lower()
+        ids = set()
+        index = bisect_left(self._names, (prefix,))
+        while index < len(self._names) and self._names[index][0].startswith(prefix):
+            ids.add(self._names[index][1])
+            index += 1
+        return ids
+
+    # All rows ordered by one column (see sort_key), cached and patched as rows change
+    def sorted_rows(self, column="id", descending=False):
+        key = (column, descending)
+        if key not in self._sorted:
+            self._sorted[key] = sorted(self.rows.values(), key=sort_key(column), reverse=descending)
+        return self._sorted[key]
+
+    # Rows matching an optional name prefix and category, in the requested order
+    def query(self, prefix="", category=None, column="id", descending=False):
+        if not prefix and not category:
+            return self.sorted_rows(column, descending)
+
+        # Intersect the index lookups first, then keep the sort order while filtering
+        ids = None
+        if prefix:
+            ids = self.ids_with_prefix(prefix)
+        if category:
+            category_ids = self._categories.get(category, set())
+            ids = category_ids if ids is None else ids & category_ids
+
+        if not ids:
+            return []
+        if len(ids) * 8 < len(self.rows):
+            # Few matches: sort just those instead of scanning every row
+            return sorted((self.rows[item_id] for item_id in ids), key=sort_key(column), reverse=descending)
+        return [row for row in self.sorted_rows(column, descending) if row.id in ids]
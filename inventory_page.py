@@ -1,7 +1,24 @@
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from db import fetch_inventory, add_inventory_item, update_inventory_item, delete_inventory_item
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog, simpledialog
+from db import PAGE_SIZE
+from metrics import metrics
+from paged_tree import PagedTreeview, create_scrolled_tree, format_timestamp, next_offset
+from inventory_model import InventoryModel, COLUMNS, sorted_index
+from bulk_import import import_inventory_csv
+from bulk_export import export_inventory
+
+# Table headings, in the same order as inventory_model.COLUMNS
+HEADINGS = ("Id", "Item Name", "Category", "Quantity", "Price", "Date Added")
+
+# Label used in the category filter for "no filter"
+ALL_CATEGORIES = "All"
+
+# Delay (ms) after the last keystroke before the search is applied
+SEARCH_DELAY_MS = 150
+
+# Changes to more rows than this redraw the view instead of patching the rows one by one
+PATCH_ROWS_LIMIT = 50
 
 class InventoryPage(tk.Frame):
     def __init__(self, parent, controller):
@@ -9,6 +26,22 @@ class InventoryPage(tk.Frame):
         self.controller = controller
         self.selected_item_id = None  
 
+        # Version of the selected item when it was loaded into the form, for optimistic locking
+        self.selected_version = None
+
+        # Client-side copy of the inventory, searched, filtered and sorted without the database
+        self.model = InventoryModel()
+        self.view_rows = []
+
+        # (lowercase name prefix, category or None) the shown rows were filtered by
+        self.view_filter = ("", None)
+        self.sort_column = "id"
+        self.sort_descending = False
+        self.search_after_id = None
+
+        # Ids changed by other clients that still need to be fetched
+        self.remote_ids = set()
+
         # Page layout
         label = tk.Label(self, text="Inventory Page", font=("Arial", 14))
         label.pack(pady=10, padx=10, anchor="w")
@@ -22,6 +55,19 @@ class InventoryPage(tk.Frame):
         button = tk.Button(self, text="Go to Ledger Page", command=go_to_ledger, bg="blue", fg="white", width=20)
         button.pack(pady=5, padx=10, anchor="w")
 
+        # Go to reports button logic
+        def go_to_reports():
+            from reports_page import ReportsPage
+            controller.show_frame(ReportsPage)
+
+        # Go to reports button
+        button = tk.Button(self, text="Go to Reports Page", command=go_to_reports, bg="blue", fg="white", width=20)
+        button.pack(pady=5, padx=10, anchor="w")
+
+        # Diagnostics button opens the live metrics window (also on F12)
+        button = tk.Button(self, text="Diagnostics", command=controller.open_diagnostics, bg="gray", fg="white", width=20)
+        button.pack(pady=5, padx=10, anchor="w")
+
         # Manage inventory items label
         label = tk.Label(self, text="Manage Inventory Items", font=("Arial", 12))
         label.pack(pady=10, padx=10, anchor="w")
@@ -68,52 +114,251 @@ class InventoryPage(tk.Frame):
         delete_button = tk.Button(button_frame, text="Clear Form", command=self.clear_form, bg="gray", fg="white", width=15)
         delete_button.pack(side=tk.LEFT, padx=5)
 
-        # Inventory Items label
-        label = tk.Label(self, text="Inventory Items", font=("Arial", 12))
-        label.pack(pady=10, padx=10, anchor="w")
+        # Stock frame for Receive and Pick buttons
+        stock_frame = tk.Frame(form_frame)
+        stock_frame.grid(row=5, column=0, columnspan=2, pady=5)
+
+        # Receive Button
+        receive_button = tk.Button(stock_frame, text="Receive Stock", command=lambda: self.adjust_item_stock(1), bg="teal", fg="white", width=15)
+        receive_button.pack(side=tk.LEFT, padx=5)
+
+        # Pick Button
+        pick_button = tk.Button(stock_frame, text="Pick Stock", command=lambda: self.adjust_item_stock(-1), bg="brown", fg="white", width=15)
+        pick_button.pack(side=tk.LEFT, padx=5)
+
+        # Bulk frame for actions on every selected row (Ctrl/Shift-click to select several)
+        bulk_frame = tk.Frame(form_frame)
+        bulk_frame.grid(row=6, column=0, columnspan=2, pady=5)
+        tk.Label(bulk_frame, text="Selected Items:").pack(side=tk.LEFT, padx=5)
+
+        # Set Price Button
+        set_price_button = tk.Button(bulk_frame, text="Set Price", command=self.bulk_set_price, bg="orange", fg="white", width=15)
+        set_price_button.pack(side=tk.LEFT, padx=5)
+
+        # Change Price Button
+        change_price_button = tk.Button(bulk_frame, text="Change Price %", command=self.bulk_change_price, bg="orange", fg="white", width=15)
+        change_price_button.pack(side=tk.LEFT, padx=5)
+
+        # Set Category Button
+        set_category_button = tk.Button(bulk_frame, text="Set Category", command=self.bulk_set_category, bg="orange", fg="white", width=15)
+        set_category_button.pack(side=tk.LEFT, padx=5)
+
+        # Delete Selected Button
+        delete_selected_button = tk.Button(bulk_frame, text="Delete Selected", command=self.bulk_delete, bg="red", fg="white", width=15)
+        delete_selected_button.pack(side=tk.LEFT, padx=5)
+
+        # Import Button
+        import_button = tk.Button(button_frame, text="Import CSV", command=self.import_items, bg="purple", fg="white", width=15)
+        import_button.pack(side=tk.LEFT, padx=5)
+
+        # Export Button
+        export_button = tk.Button(button_frame, text="Export", command=self.export_items, bg="purple", fg="white", width=15)
+        export_button.pack(side=tk.LEFT, padx=5)
+
+        # Inventory Items label with an in-flight indicator beside it
+        header_frame = tk.Frame(self)
+        header_frame.pack(pady=10, padx=10, fill="x")
+        label = tk.Label(header_frame, text="Inventory Items", font=("Arial", 12))
+        label.pack(side=tk.LEFT)
+        self.status_label = tk.Label(header_frame, text="", fg="gray")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        # Show the indicator while any inventory database call is running
+        controller.worker.add_busy_listener(self.on_busy_changed)
+
+        # Apply changes pushed by other clients
+        controller.listener.subscribe(self.on_remote_changes)
+
+        # Search box and category filter
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(padx=10, fill="x")
+        tk.Label(filter_frame, text="Search Name:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        tk.Entry(filter_frame, textvariable=self.search_var, width=30).pack(side=tk.LEFT, padx=5)
+        tk.Label(filter_frame, text="Category:").pack(side=tk.LEFT, padx=(10, 0))
+        self.category_filter = ttk.Combobox(filter_frame, values=(ALL_CATEGORIES,), state="readonly", width=25)
+        self.category_filter.set(ALL_CATEGORIES)
+        self.category_filter.bind("<<ComboboxSelected>>", lambda event: self.apply_view())
+        self.category_filter.pack(side=tk.LEFT, padx=5)
 
         # Create Table
-        self.tree = ttk.Treeview(self, columns=("Id", "Item Name", "Category", "Quantity", "Price", "Date Added"), show="headings", height=25)
+        table_frame, self.tree, scrollbar = create_scrolled_tree(self, HEADINGS, height=25, selectmode="extended")
 
-        # Define column headings
-        for col in ("Id", "Item Name", "Category", "Quantity", "Price", "Date Added"):
-            self.tree.heading(col, text=col)
+        # Define column headings, clicking one sorts by that column
+        for col, column in zip(HEADINGS, COLUMNS):
+            self.tree.heading(col, text=col, command=lambda column=column: self.sort_by(column))
             self.tree.column(col, width=160, anchor="center")
 
         # Pack table
-        self.tree.pack(pady=10, padx=10, expand=True, fill="both")
+        table_frame.pack(pady=10, padx=10, expand=True, fill="both")
+
+        # Rows of the current view are put in the table one page at a time as it is scrolled
+        self.pager = PagedTreeview(
+            self.tree, scrollbar, None, self.fetch_view_page, self.format_inventory_row,
+            key="inventory.view", group="inventory", page_size=PAGE_SIZE, next_cursor=next_offset,
+        )
 
         # Bind row selection
         self.tree.bind("<ButtonRelease-1>", self.on_item_selected)
 
-        # Load inventory data
-        self.load_inventory()
+        # Load inventory data once the empty page has been drawn
+        self.after_idle(self.load_inventory)
 
     # Load inventory data from db
     def load_inventory(self):
-        # Fetch inventory data (fetch_inventory function is defined in db.py)
-        data = fetch_inventory()
+        # Fetch inventory data in the background (fetch_inventory function is defined in db.py and local_store.py).
+        # Repeated refreshes replace each other so only the newest one reaches the table.
+        self.controller.worker.submit(
+            self.controller.data.fetch_inventory, key="inventory.load", group="inventory",
+            on_success=self.on_inventory_loaded, on_error=self.show_db_error,
+        )
+
+    # Rebuilds the client-side model from freshly fetched rows
+    def on_inventory_loaded(self, rows):
+        self.model.load(rows)
+        self.apply_view()
+        self.controller.mark_startup("inventory loaded")
+
+    # Re-runs the search, filter and sort against the model and redraws the table.
+    # With keep_position the rows already shown are refilled and the scroll offset is kept.
+    def apply_view(self, keep_position=False):
+        started = time.perf_counter()
+        self.search_after_id = None
+
+        category = self.update_category_filter()
+        prefix = self.search_var.get().strip()
+        self.view_filter = (prefix.lower(), None if category == ALL_CATEGORIES else category)
+        self.view_rows = self.model.query(prefix, self.view_filter[1], self.sort_column, self.sort_descending)
+        self.pager.reload(keep_position)
+        metrics.observe("ui_refresh_seconds", time.perf_counter() - started, view="inventory")
+
+    # Offers the current categories in the filter, returns the selected one (ALL_CATEGORIES if it is gone)
+    def update_category_filter(self):
+        category = self.category_filter.get()
+        self.category_filter.configure(values=(ALL_CATEGORIES, *self.model.categories()))
+        if category != ALL_CATEGORIES and category not in self.model.categories():
+            category = ALL_CATEGORIES
+            self.category_filter.set(category)
+        return category
+
+    # Puts changed rows into the model and moves, updates or drops just those rows in the table.
+    # Larger batches, or a search still waiting to run, redraw the view instead.
+    def patch_view(self, rows=(), removed_ids=()):
+        if len(rows) + len(removed_ids) > PATCH_ROWS_LIMIT or self.search_after_id is not None:
+            for row in rows:
+                self.model.upsert(row)
+            for item_id in removed_ids:
+                self.model.remove(item_id)
+            self.apply_view(keep_position=True)
+            return
 
-        # Sort data by ID 
-        sorted_data = sorted(data, key=lambda item: item[0])  
+        started = time.perf_counter()
+        for row in rows:
+            self.patch_item(row[0], row)
+        for item_id in removed_ids:
+            self.patch_item(item_id, None)
+
+        # The selected category may have lost its last item
+        if self.update_category_filter() != (self.view_filter[1] or ALL_CATEGORIES):
+            self.apply_view()
+        metrics.observe("ui_refresh_seconds", time.perf_counter() - started, view="inventory")
+
+    # Replaces (or with row None, removes) one item in the model, the view rows and the table
+    def patch_item(self, item_id, row):
+        old_index = self.view_index(self.model.rows.get(item_id))
+        if row is None:
+            self.model.remove(item_id)
+        else:
+            self.model.upsert(row)
+        item = self.model.rows.get(item_id)
+
+        # Without a filter the view rows are the model's sorted list, which the model patched already
+        if any(self.view_filter):
+            if old_index is not None:
+                del self.view_rows[old_index]
+            if item is not None and self.in_view(item):
+                self.view_rows.insert(sorted_index(self.view_rows, item, self.sort_column, self.sort_descending), item)
+
+        new_index = self.view_index(item)
+        if not self.pager.patch_row(item_id, item and item.astuple(), old_index, new_index):
+            self.pager.reload(keep_position=True)
+
+    # Position of an item in the view rows, or None if it isn't shown by the current filter
+    def view_index(self, item):
+        if item is None:
+            return None
+        index = sorted_index(self.view_rows, item, self.sort_column, self.sort_descending)
+        return index if index < len(self.view_rows) and self.view_rows[index] is item else None
+
+    def in_view(self, item):
+        prefix, category = self.view_filter
+        return item.name.lower().startswith(prefix) and category in (None, item.category)
+
+    # Hands the pager one page of the current view
+    def fetch_view_page(self, offset, limit):
+        return [row.astuple() for row in self.view_rows[offset:offset + limit]]
+
+    # Waits for typing to pause before searching
+    def on_search_changed(self, *args):
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DELAY_MS, self.apply_view)
+
+    # Sorts by a column, clicking the same column again reverses the order
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
 
-        # Clear existing data from table
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        # Show the sort direction on the heading
+        for col, name in zip(HEADINGS, COLUMNS):
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if name == column else ""
+            self.tree.heading(col, text=col + arrow)
 
-        # Insert new data into the table with formatted date
-        for item in sorted_data:
-            item_id, name, category, quantity, price, date_added = item
+        self.apply_view()
 
-            # Convert timestamp to readable format (YYYY-MM-DD HH:MM:SS)
-            try:
-                formatted_date = datetime.strptime(str(date_added), "%Y-%m-%d %H:%M:%S.%f").strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                # Incase timestamp doesn't have microseconds 
-                formatted_date = datetime.strptime(str(date_added), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    # Puts an added or updated row into the model and the table
+    def apply_item(self, row):
+        self.patch_view(rows=[row])
 
-            # Insert data into table
-            self.tree.insert("", "end", values=(item_id, name, category, quantity, price, formatted_date))
+    # Drops a deleted row from the model and the table
+    def remove_item(self, item_id):
+        self.patch_view(removed_ids=[item_id])
+
+    # Called with a ChangeBatch when other clients change inventory (see listener.py)
+    def on_remote_changes(self, batch):
+        if batch.resync or batch.inventory_reload:
+            self.load_inventory()
+            return
+        if not batch.inventory_ids:
+            return
+
+        # Ids stay pending until fetched, so a superseded fetch doesn't lose any
+        self.remote_ids |= batch.inventory_ids
+        ids = frozenset(self.remote_ids)
+        self.controller.worker.submit(
+            self.controller.data.fetch_inventory_rows, ids, key="inventory.remote",
+            on_success=lambda rows: self.apply_remote_rows(ids, rows),
+            on_error=lambda error: print(f"Error applying remote inventory changes: {error}"),
+        )
+
+    # Patches fetched rows into the model; ids that came back empty were deleted
+    def apply_remote_rows(self, ids, rows):
+        self.remote_ids -= ids
+        found = {row[0] for row in rows}
+        self.patch_view(rows, [item_id for item_id in ids if item_id not in found])
+
+    # Turn an inventory row into table values with a formatted date
+    def format_inventory_row(self, item):
+        item_id, name, category, quantity, price, date_added = item[:6]
+
+        # Format the datetime directly, no parsing needed
+        formatted_date = format_timestamp(date_added)
+
+        return (item_id, name, category, quantity, price, formatted_date)
 
     # Handles selecting an item from the treeview
     def on_item_selected(self, event):
@@ -126,6 +371,8 @@ class InventoryPage(tk.Frame):
             item = self.tree.item(selected[0])["values"]
             if item:
                 self.selected_item_id = item[0]  
+                selected_row = self.model.rows.get(item[0])
+                self.selected_version = selected_row.version if selected_row else None
                 self.name_entry.delete(0, tk.END)
                 self.name_entry.insert(0, item[1])
                 self.category_entry.delete(0, tk.END)
@@ -149,16 +396,12 @@ class InventoryPage(tk.Frame):
             messagebox.showerror("Error", "Please enter valid values!")
             return
 
-        # Add item to database (add_inventory_item function is defined in db.py)
-        result = add_inventory_item(name, category, int(quantity), float(price))
-
-        # Show success or error message in a message box
-        if result == "Item added successfully!":
-            self.load_inventory()
-            self.clear_form()
-            messagebox.showinfo("Success", result)
-        else:
-            messagebox.showerror("Error", result)
+        # Add item to database in the background (add_inventory_item function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.add_inventory_item, name, category, int(quantity), float(price), group="inventory",
+            on_success=lambda result: self.on_mutation_done(result, "Item added successfully!", self.apply_item),
+            on_error=self.show_db_error,
+        )
 
     # Updates the selected item
     def update_item(self):
@@ -179,16 +422,121 @@ class InventoryPage(tk.Frame):
             messagebox.showerror("Error", "Please enter valid values!")
             return
 
-        # Update item in database (update_inventory_item function is defined in db.py)
-        result = update_inventory_item(self.selected_item_id, name, category, int(quantity), float(price))
+        # Update item in database in the background (update_inventory_item function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.update_inventory_item, self.selected_item_id, name, category, int(quantity), float(price), self.selected_version, group="inventory",
+            on_success=lambda result: self.on_mutation_done(result, "Item updated successfully!", self.apply_item),
+            on_error=self.show_db_error,
+        )
+
+    # Receives (direction 1) or picks (direction -1) stock for the selected item
+    def adjust_item_stock(self, direction):
+
+        # Check if an item is selected when the button is pushed
+        if not self.selected_item_id:
+            messagebox.showerror("Error", "No item selected!")
+            return
+
+        # Ask how many units and why
+        action = "Receive" if direction > 0 else "Pick"
+        amount = simpledialog.askinteger(action, f"Units to {action.lower()}:", parent=self, minvalue=1)
+        if not amount:
+            return
+        reason = simpledialog.askstring(action, "Reason (optional):", parent=self)
+
+        # Adjust stock in the background (adjust_stock function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.adjust_stock, self.selected_item_id, direction * amount, reason or action.upper(), group="inventory",
+            on_success=lambda result: self.on_mutation_done(result, "Stock adjusted successfully!", self.apply_item),
+            on_error=self.show_db_error,
+        )
+
+    # Ids of every selected row
+    def selected_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+    # Sets one price on every selected item
+    def bulk_set_price(self):
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showerror("Error", "No items selected!")
+            return
+
+        price = simpledialog.askfloat("Set Price", f"New price for {len(ids)} items:", parent=self, minvalue=0.01)
+        if price is None:
+            return
+
+        # Update items in database in the background (bulk_update_items function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.bulk_update_items, [(item_id, None, price) for item_id in ids], group="inventory",
+            on_success=self.on_bulk_done, on_error=self.show_db_error,
+        )
+
+    # Changes the price of every selected item by a percentage
+    def bulk_change_price(self):
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showerror("Error", "No items selected!")
+            return
+
+        percent = simpledialog.askfloat("Change Price", f"Percent change for {len(ids)} items (e.g. 10 or -5):", parent=self)
+        if percent is None:
+            return
+
+        # Reprice items in database in the background (bulk_change_price_percent function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.bulk_change_price_percent, ids, percent, group="inventory",
+            on_success=self.on_bulk_done, on_error=self.show_db_error,
+        )
+
+    # Moves every selected item to one category
+    def bulk_set_category(self):
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showerror("Error", "No items selected!")
+            return
+
+        category = simpledialog.askstring("Set Category", f"New category for {len(ids)} items:", parent=self)
+        if not category or not category.strip():
+            return
+
+        # Update items in database in the background (bulk_update_items function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.bulk_update_items, [(item_id, category.strip(), None) for item_id in ids], group="inventory",
+            on_success=self.on_bulk_done, on_error=self.show_db_error,
+        )
+
+    # Deletes every selected item
+    def bulk_delete(self):
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showerror("Error", "No items selected!")
+            return
+
+        if not messagebox.askyesno("Delete Selected", f"Delete {len(ids)} items?"):
+            return
+
+        # Delete items from database in the background (bulk_delete_items function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.bulk_delete_items, ids, group="inventory",
+            on_success=lambda outcome: self.on_bulk_done(outcome, deleted=True), on_error=self.show_db_error,
+        )
+
+    # Patches every affected row into the model once a bulk action has finished
+    def on_bulk_done(self, outcome, deleted=False):
+        result, rows = outcome
 
         # Show success or error message in a message box
-        if result == "Item updated successfully!":
-            self.load_inventory()
-            self.clear_form()
-            messagebox.showinfo("Success", result)
-        else:
+        if result.startswith("Error") or not rows:
             messagebox.showerror("Error", result)
+            return
+
+        if deleted:
+            self.patch_view(removed_ids=[row[0] for row in rows])
+        else:
+            self.patch_view(rows)
+        self.clear_form()
+        messagebox.showinfo("Success", result)
 
     # Deletes the selected item
     def delete_item(self):
@@ -198,17 +546,76 @@ class InventoryPage(tk.Frame):
             messagebox.showerror("Error", "No item selected!")
             return
 
-        # Delete item from database (delete_inventory_item function is defined in db.py)
-        result = delete_inventory_item(self.selected_item_id)
+        # Delete item from database in the background (delete_inventory_item function is defined in db.py and local_store.py)
+        self.controller.worker.submit(
+            self.controller.data.delete_inventory_item, self.selected_item_id, group="inventory",
+            on_success=lambda result: self.on_mutation_done(result, "Item deleted successfully!", lambda row: self.remove_item(row[0])),
+            on_error=self.show_db_error,
+        )
+
+    # Bulk imports items from a CSV file
+    def import_items(self):
+
+        # Ask for the file to import
+        path = filedialog.askopenfilename(title="Import Inventory", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+
+        # Import in the background (import_inventory_csv function is defined in bulk_import.py)
+        self.controller.worker.submit(
+            import_inventory_csv, path, group="inventory",
+            on_success=self.on_import_done, on_error=self.show_db_error,
+        )
+
+    # Reloads the table and reports the import summary with the first few rejected rows
+    def on_import_done(self, result):
+        self.load_inventory()
+
+        message = result.summary()
+        if result.rejects:
+            lines = [f"Line {line_number} ({name}): {reason}" for line_number, name, reason in result.rejects[:10]]
+            if len(result.rejects) > 10:
+                lines.append(f"...and {len(result.rejects) - 10} more")
+            message += "\n\nRejected rows:\n" + "\n".join(lines)
+        messagebox.showinfo("Import", message)
+
+    # Exports the whole inventory to CSV or JSON Lines
+    def export_items(self):
+
+        # Ask where to save the export
+        path = filedialog.asksaveasfilename(title="Export Inventory", defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+
+        # Export in the background (export_inventory function is defined in bulk_export.py)
+        self.controller.worker.submit(
+            export_inventory, path, group="inventory",
+            on_success=lambda result: messagebox.showinfo("Export", f"Exported {result[0]} items in {result[1]:.2f}s"),
+            on_error=self.show_db_error,
+        )
+
+    # Runs on the main thread once an add, update or delete has finished.
+    # Only the affected row is patched into the model instead of reloading the whole table.
+    def on_mutation_done(self, outcome, success_message, apply_row):
+        result, row = outcome
 
         # Show success or error message in a message box
-        if result == "Item deleted successfully!":
-            self.load_inventory()
+        if result == success_message:
+            if row is not None:
+                apply_row(row)
             self.clear_form()
             messagebox.showinfo("Success", result)
         else:
             messagebox.showerror("Error", result)
 
+    # Shows unexpected errors raised by a background database call
+    def show_db_error(self, error):
+        messagebox.showerror("Error", f"Database error: {error}")
+
+    # Toggles the in-flight indicator
+    def on_busy_changed(self, busy_groups):
+        self.status_label.config(text="Working..." if "inventory" in busy_groups else "")
+
     # Clears the input fields
     def clear_form(self):
 
@@ -218,3 +625,4 @@ class InventoryPage(tk.Frame):
         self.quantity_entry.delete(0, tk.END)
         self.price_entry.delete(0, tk.END)
         self.selected_item_id = None  
+        self.selected_version = None
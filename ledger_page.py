@@ -1,7 +1,11 @@
+import time
 import tkinter as tk
-from tkinter import ttk
-from db import fetch_ledger  # Ensure you have a function to fetch ledger data
-from datetime import datetime
+from tkinter import ttk, messagebox, filedialog
+from db import PAGE_SIZE
+from paged_tree import PagedTreeview, create_scrolled_tree, format_timestamp, next_offset
+from bulk_export import export_ledger
+from snapshots import inventory_as_of
+from datetime import datetime, date
 
 class LedgerPage(tk.Frame):
     def __init__(self, parent, controller):
@@ -21,54 +25,162 @@ class LedgerPage(tk.Frame):
         button = tk.Button(self, text="Go to Inventory Page", command=go_to_inventory, bg="blue", fg="white", width=20)
         button.pack(pady=5, padx=10, anchor="w")
 
-        # Ledger label
-        label = tk.Label(self, text="Inventory Ledger", font=("Arial", 12))
-        label.pack(pady=10, padx=10, anchor="w")
+        # Go to reports button logic
+        def go_to_reports():
+            from reports_page import ReportsPage
+            controller.show_frame(ReportsPage)
+
+        # Go to reports button
+        button = tk.Button(self, text="Go to Reports Page", command=go_to_reports, bg="blue", fg="white", width=20)
+        button.pack(pady=5, padx=10, anchor="w")
+
+        # Ledger label with an in-flight indicator beside it
+        header_frame = tk.Frame(self)
+        header_frame.pack(pady=10, padx=10, fill="x")
+        label = tk.Label(header_frame, text="Inventory Ledger", font=("Arial", 12))
+        label.pack(side=tk.LEFT)
+        self.status_label = tk.Label(header_frame, text="", fg="gray")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        # Resync button reloads the whole ledger in case the incremental view drifted
+        resync_button = tk.Button(header_frame, text="Resync", command=self.load_ledger, bg="gray", fg="white", width=10)
+        resync_button.pack(side=tk.RIGHT)
+
+        # Export button streams the ledger to a file
+        export_button = tk.Button(header_frame, text="Export", command=self.export_entries, bg="purple", fg="white", width=10)
+        export_button.pack(side=tk.RIGHT, padx=5)
+
+        # Date picker for point-in-time stock
+        as_of_frame = tk.Frame(self)
+        as_of_frame.pack(padx=10, fill="x")
+        tk.Label(as_of_frame, text="Stock as of (Y / M / D):").pack(side=tk.LEFT)
+        today = date.today()
+        self.as_of_year = ttk.Spinbox(as_of_frame, from_=2000, to=today.year + 1, width=6)
+        self.as_of_month = ttk.Spinbox(as_of_frame, from_=1, to=12, width=4)
+        self.as_of_day = ttk.Spinbox(as_of_frame, from_=1, to=31, width=4)
+        for spinbox, value in ((self.as_of_year, today.year), (self.as_of_month, today.month), (self.as_of_day, today.day)):
+            spinbox.set(value)
+            spinbox.pack(side=tk.LEFT, padx=2)
+        as_of_button = tk.Button(as_of_frame, text="Show Stock", command=self.show_stock_as_of, bg="blue", fg="white", width=12)
+        as_of_button.pack(side=tk.LEFT, padx=5)
+
+        # Show the indicator while the ledger is loading
+        controller.worker.add_busy_listener(self.on_busy_changed)
+
+        # Append entries written by other clients as they happen
+        controller.listener.subscribe(self.on_remote_changes)
 
         # Create table
-        self.tree = ttk.Treeview(self, columns=("Operation", "Item Name", "Category", "Prev Quantity", "New Quantity", "Previous Price", "New Price", "Date Modified"), show="headings")
+        table_frame, self.tree, scrollbar = create_scrolled_tree(self, ("Operation", "Item Name", "Category", "Prev Quantity", "New Quantity", "Previous Price", "New Price", "Date Modified", "Reason"))
 
         # Define column headings
-        for col in ("Operation", "Item Name", "Category", "Prev Quantity", "New Quantity", "Previous Price", "New Price", "Date Modified"):
+        for col in ("Operation", "Item Name", "Category", "Prev Quantity", "New Quantity", "Previous Price", "New Price", "Date Modified", "Reason"):
             self.tree.heading(col, text=col)
             self.tree.column(col, width=160, anchor="center")
 
-        self.tree.pack(pady=10, padx=10, expand=True, fill="both")
+        table_frame.pack(pady=10, padx=10, expand=True, fill="both")
+
+        # Rows are fetched one page at a time as the table is scrolled (fetch_ledger_tail is defined in db.py and local_store.py).
+        # Entries that commit after higher ids were shown are still picked up and put in order.
+        self.pager = PagedTreeview(
+            self.tree, scrollbar, controller.worker, controller.data.fetch_ledger_tail, self.format_ledger_row,
+            key="ledger.load", group="ledger", page_size=PAGE_SIZE, on_error=self.show_db_error, tail=True,
+        )
 
-        # Load ledger data
-        self.load_ledger()
+        # Ledger data is loaded by tkraise the first time the page is shown
 
     # Load ledger data from db
     def load_ledger(self):
 
-        # Fetch ledger data (fetch_ledger function is defined in db.py)
-        data = fetch_ledger()
-
-        # Sort data by id
-        sorted_data = sorted(data, key=lambda item: item[0])  
-
-        # Clear existing data
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        # Insert new data into the table with formatted date
-        for item in sorted_data:
-
-            _, operation, item_name, category, prev_quantity, new_quantity, prev_price, new_price, date_modified = item
-
-            # Convert timestamp to readable format (YYYY-MM-DD HH:MM:SS)
-            try:
-                formatted_date = datetime.strptime(str(date_modified), "%Y-%m-%d %H:%M:%S.%f").strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                # Incase timestamp doesn't have microseconds
-                formatted_date = datetime.strptime(str(date_modified), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
-
-            # Insert data into table
-            self.tree.insert("", "end", values=(operation, item_name, category, prev_quantity, new_quantity, prev_price, new_price, formatted_date))
-
-    # Script to reload the data from db
+        # Fetch the first page in the background, already sorted by id in SQL.
+        # Repeated refreshes replace each other so only the newest one reaches the table.
+        self.pager.reload()
+
+    # Turn a ledger row into table values with a formatted date
+    def format_ledger_row(self, item):
+        _, operation, item_name, category, prev_quantity, new_quantity, prev_price, new_price, date_modified, reason = item[:10]
+
+        # Format the datetime directly, no parsing needed
+        formatted_date = format_timestamp(date_modified)
+
+        return (operation, item_name, category, prev_quantity, new_quantity, prev_price, new_price, formatted_date, reason or "")
+
+    # Exports the whole ledger to CSV or JSON Lines (use bulk_export.py for date and operation filters)
+    def export_entries(self):
+
+        # Ask where to save the export
+        path = filedialog.asksaveasfilename(title="Export Ledger", defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+
+        # Export in the background (export_ledger function is defined in bulk_export.py)
+        self.controller.worker.submit(
+            export_ledger, path, group="ledger",
+            on_success=lambda result: messagebox.showinfo("Export", f"Exported {result[0]} ledger entries in {result[1]:.2f}s"),
+            on_error=self.show_db_error,
+        )
+
+    # Reconstructs the inventory at the end of the picked day
+    def show_stock_as_of(self):
+        try:
+            day = date(int(self.as_of_year.get()), int(self.as_of_month.get()), int(self.as_of_day.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid date!")
+            return
+        timestamp = datetime.combine(day, datetime.max.time())
+
+        # Reconstruct in the background (inventory_as_of function is defined in snapshots.py)
+        started = time.perf_counter()
+        self.controller.worker.submit(
+            inventory_as_of, timestamp, key="ledger.as_of", group="ledger",
+            on_success=lambda result: self.open_stock_window(day, result, time.perf_counter() - started),
+            on_error=self.show_db_error,
+        )
+
+    # Opens a window listing the reconstructed stock and its total value
+    def open_stock_window(self, day, result, seconds):
+        rows, replayed = result
+        total = sum(quantity * price for _, _, _, quantity, price in rows)
+
+        window = tk.Toplevel(self)
+        window.title(f"Stock as of {day.isoformat()}")
+        summary = f"{len(rows)} items, total value {total:.2f} (replayed {replayed} ledger entries in {seconds:.2f}s)"
+        tk.Label(window, text=summary, font=("Arial", 12)).pack(pady=10, padx=10, anchor="w")
+
+        columns = ("Id", "Item Name", "Category", "Quantity", "Price", "Value")
+        table_frame, tree, scrollbar = create_scrolled_tree(window, columns, height=25)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=140, anchor="center")
+        table_frame.pack(pady=10, padx=10, expand=True, fill="both")
+
+        # Rows go into the table a page at a time as it is scrolled
+        window.pager = PagedTreeview(
+            tree, scrollbar, None, lambda offset, limit: rows[offset:offset + limit],
+            lambda row: (*row, f"{row[3] * row[4]:.2f}"),
+            key="ledger.stock", group=None, page_size=PAGE_SIZE, next_cursor=next_offset,
+        )
+        window.pager.reload()
+
+    # Shows unexpected errors raised by a background database call
+    def show_db_error(self, error):
+        messagebox.showerror("Error", f"Database error: {error}")
+
+    # Toggles the in-flight indicator
+    def on_busy_changed(self, busy_groups):
+        self.status_label.config(text="Loading..." if "ledger" in busy_groups else "")
+
+    # Called with a ChangeBatch when any client writes to the ledger (see listener.py)
+    def on_remote_changes(self, batch):
+        if batch.resync:
+            self.load_ledger()
+        elif batch.ledger_changed:
+            self.refresh_ledger()
+
+    # Script to pick up new data from db. The ledger is append-only, so only entries
+    # newer than the highest id already shown, and lower ones that committed late, are fetched.
     def refresh_ledger(self):
-        self.load_ledger()
+        self.pager.refresh()
 
     # Script that overrides the tkraise function so every time the frame is brought to the front of the tk.Frame stack 
     # it not only loads the the frame but executes the refresh as well
@@ -0,0 +1,53 @@
+import json
+
+# Ledger ids come from a sequence when the writing transaction inserts its row, so a lower id
+# can commit after a higher one that is already visible. Reading strictly after the highest
+# id seen would skip such entries for good.
+#
+# A LedgerWatermark remembers the highest id delivered and every lower id that was missing
+# ("gaps"). Each gap is stored with the snapshot's xmax (the first transaction id not yet
+# assigned) from when it was first seen: the transaction holding that id, if any, was already
+# running then (every ledger write changes inventory first, which assigns the transaction id).
+# Once a later snapshot's xmin has passed that value the transaction has finished, so a gap
+# still missing then was rolled back and can be forgotten. Until then it is re-read by id.
+class LedgerWatermark:
+    def __init__(self, high=0, gaps=None):
+        self.high = high
+        self.gaps = dict(gaps or {})
+
+    # Every id up to here has been delivered or can never appear
+    @property
+    def settled_id(self):
+        return min(self.gaps) - 1 if self.gaps else self.high
+
+    # Watermark after a read that returned ids (the rows with an id in gaps or above high)
+    # under a snapshot with the given xmin and xmax. Returns a new watermark, so a read whose
+    # rows get thrown away doesn't move the old one.
+    def advance(self, ids, snapshot_xmin, snapshot_xmax):
+        present = set(ids)
+        high = max(present | {self.high})
+
+        # Gaps that are still missing and whose writers may still be running
+        gaps = {gap: seen for gap, seen in self.gaps.items() if gap not in present and snapshot_xmin < seen}
+
+        # New gaps; with no transaction running at all they can't be filled any more
+        if snapshot_xmin < snapshot_xmax:
+            for gap in range(self.high + 1, high):
+                if gap not in present:
+                    gaps[gap] = snapshot_xmax
+
+        return LedgerWatermark(high, gaps)
+
+    def to_json(self):
+        return json.dumps({"high": self.high, "gaps": {str(gap): seen for gap, seen in self.gaps.items()}})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data["high"], {int(gap): seen for gap, seen in data["gaps"].items()})
+
+    def __eq__(self, other):
+        return isinstance(other, LedgerWatermark) and (self.high, self.gaps) == (other.high, other.gaps)
+
+    def __repr__(self):
+        return f"LedgerWatermark(high={self.high}, gaps={self.gaps})"
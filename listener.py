@@ -0,0 +1,140 @@
+import json
+import queue
+import select
+import threading
+import psycopg2
+from db_pool import DB_URL, APPLICATION_NAME
+
+# Channel the database triggers publish changes on (see migrations 4 and 13 in migrations.py)
+CHANNEL = "inventory_changes"
+
+# How often (ms) the Tk main loop hands collected changes to subscribers
+DISPATCH_INTERVAL_MS = 250
+
+# Seconds to wait before reconnecting after the listening connection drops
+RECONNECT_DELAY = 5
+
+
+# One batch of changes, merged across every notification received since the last dispatch
+class ChangeBatch:
+    def __init__(self):
+        self.inventory_ids = set()
+        self.ledger_changed = False
+
+        # True when a statement changed too many items to list them: reload the whole inventory
+        self.inventory_reload = False
+
+        # True after a reconnect: notifications may have been missed, so views should reload
+        self.resync = False
+
+
+# Listens for change notifications from other clients on a dedicated connection.
+# LISTEN needs a long-lived session, so this connection is kept outside the pool.
+# The background thread only queues payloads; dispatch() runs on the Tk main loop
+# and passes one merged ChangeBatch to each subscriber.
+class ChangeListener:
+    def __init__(self, root, dsn=DB_URL):
+        self.root = root
+        self.dsn = dsn
+        self._subscribers = []
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._listen, name="db-listener", daemon=True)
+        self._after_id = None
+
+        # When set, batches go to relay(batch) instead of the subscribers (see publish)
+        self.relay = None
+
+    # callback(batch) is called on the main thread with every merged batch of changes
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def start(self):
+        self._thread.start()
+        self._after_id = self.root.after(DISPATCH_INTERVAL_MS, self.dispatch)
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    # Hands a batch to every subscriber. Also used to announce changes made locally,
+    # e.g. by the local store's sync, or to pass on a relayed batch once it has been handled.
+    def publish(self, batch):
+        for callback in self._subscribers:
+            callback(batch)
+
+    # Runs on the listener thread
+    def _listen(self):
+        first_connect = True
+        while not self._stop.is_set():
+            try:
+                conn = psycopg2.connect(self.dsn)
+            except psycopg2.Error as e:
+                print(f"Change listener could not connect: {e}")
+                self._stop.wait(RECONNECT_DELAY)
+                continue
+
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+
+                # Anything that happened while disconnected is lost, so ask views to reload
+                if not first_connect:
+                    self._events.put(None)
+                first_connect = False
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._events.put(conn.notifies.pop(0).payload)
+            except (psycopg2.Error, OSError) as e:
+                print(f"Change listener lost its connection: {e}")
+                self._stop.wait(RECONNECT_DELAY)
+            finally:
+                conn.close()
+
+    # Runs on the main thread
+    def dispatch(self):
+        batch = ChangeBatch()
+        received = False
+
+        while True:
+            try:
+                payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            received = True
+
+            if payload is None:
+                batch.resync = True
+                continue
+
+            try:
+                event = json.loads(payload)
+            except ValueError:
+                continue
+
+            if event.get("table") == "inventory":
+                # Writes made through this process' own pool are already applied
+                if event.get("client") == APPLICATION_NAME:
+                    continue
+                if event.get("op") == "reload":
+                    batch.inventory_reload = True
+                else:
+                    batch.inventory_ids.update(event["ids"])
+            elif event.get("table") == "ledger":
+                batch.ledger_changed = True
+
+        if received:
+            if self.relay:
+                self.relay(batch)
+            else:
+                self.publish(batch)
+
+        if not self._stop.is_set():
+            self._after_id = self.root.after(DISPATCH_INTERVAL_MS, self.dispatch)
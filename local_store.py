@@ -0,0 +1,633 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import psycopg2
+from contextlib import nullcontext
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from dotenv import load_dotenv
+from db import fetch_ledger_tail, stream_inventory, fetch_inventory_rows, PAGE_SIZE
+from ledger_watermark import LedgerWatermark
+from db_pool import connection
+from metrics import timed
+from repository import InventoryRepository, InventoryError, ItemNotFound, validate_new_item
+
+load_dotenv()
+
+# Path of the optional local SQLite store. When set, the pages read and write it and
+# a write-behind queue syncs changes to PostgreSQL; when unset everything goes straight to PostgreSQL.
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH")
+
+# Queued operations sent to PostgreSQL per transaction
+SYNC_BATCH_SIZE = 500
+
+# Ledger rows copied into the local mirror per round trip
+LEDGER_PULL_SIZE = 5000
+
+# Ledger entries written by offline mutations get this plus their outbox seq as id, so they
+# sort after every server entry. Each is dropped once its operation has been pushed (the
+# server's own entry arrives with the next pull) or refused.
+LOCAL_LEDGER_ID = 1 << 62
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price TEXT NOT NULL,
+    date_added TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS ledger (
+    id INTEGER PRIMARY KEY,
+    operation_type TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    category TEXT,
+    previous_quantity INTEGER,
+    new_quantity INTEGER,
+    previous_price TEXT,
+    new_price TEXT,
+    timestamp TEXT,
+    reason TEXT,
+    item_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    operation TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS outbox_status_idx ON outbox (status, seq);
+CREATE INDEX IF NOT EXISTS outbox_item_idx ON outbox (item_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+CENT = Decimal("0.01")
+
+
+def _price(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _decimal(value):
+    return Decimal(value) if value is not None else None
+
+
+# Local inventory row -> the same shape as a PostgreSQL inventory row
+def _inventory_row(row):
+    item_id, name, category, quantity, price, date_added, version = row
+    return (item_id, name, category, quantity, Decimal(price), _timestamp(date_added), version)
+
+# Local ledger row -> the same shape as a PostgreSQL ledger row
+def _ledger_row(row):
+    row = list(row)
+    row[6], row[7], row[8] = _decimal(row[6]), _decimal(row[7]), _timestamp(row[8])
+    return tuple(row)
+
+# PostgreSQL row -> values for the local tables
+def _local_values(row):
+    return tuple(str(value) if isinstance(value, (Decimal, datetime)) else value for value in row)
+
+
+# Outcome of one sync: pushed is the number of queued operations applied to PostgreSQL,
+# conflicts lists (seq, operation, item_id, error) for those refused, changed_ids are
+# local inventory ids that now hold different data (including replaced temporary ids)
+class SyncResult:
+    def __init__(self):
+        self.pushed = 0
+        self.conflicts = []
+        self.changed_ids = set()
+        self.ledger_rows = 0
+        self.pending = 0
+
+
+# Offline-first inventory store in a local SQLite database (WAL mode).
+# Exposes the same read and mutation functions as db.py, answered from local disk:
+# every mutation is applied locally at once and queued in the outbox, and sync()
+# pushes the queue to PostgreSQL in grouped transactions and pulls other clients' changes.
+#
+# Items added offline get negative temporary ids until their insert reaches PostgreSQL.
+# Offline mutations also write pending ledger entries (see LOCAL_LEDGER_ID).
+# Every queued operation carries this store's client id and sequence number, recorded in
+# sync_applied in the same transaction, so a batch is never applied twice even if the
+# connection drops between the commit and the local bookkeeping.
+class LocalStore:
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.client_id = self._client_id()
+
+    def _client_id(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'client_id'").fetchone()
+        if row:
+            return row[0]
+        client_id = str(uuid.uuid4())
+        self._db.execute("INSERT INTO meta (key, value) VALUES ('client_id', ?)", (client_id,))
+        return client_id
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Runs fn(db) in one SQLite transaction under the store lock
+    def _write(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _get(self, db, item_id):
+        return db.execute(
+            "SELECT id, name, category, quantity, price, date_added, version FROM inventory WHERE id = ?", (item_id,)
+        ).fetchone()
+
+    # Adds an operation to the outbox, returns its seq
+    def _queue(self, db, operation, item_id, **payload):
+        return db.execute(
+            "INSERT INTO outbox (operation, item_id, payload) VALUES (?, ?, ?)",
+            (operation, item_id, json.dumps(payload)),
+        ).lastrowid
+
+    # Writes the pending ledger entry for a queued operation, shaped like the one PostgreSQL will write
+    def _log(self, db, seq, operation_type, item_id, name, category, previous_quantity, new_quantity,
+             previous_price, new_price, reason=None):
+        db.execute(
+            "INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (LOCAL_LEDGER_ID + seq, operation_type, name, category, previous_quantity, new_quantity,
+             previous_price, new_price, datetime.now().isoformat(sep=" "), reason, item_id),
+        )
+
+    # Reads, always answered locally
+
+    def fetch_inventory(self):
+        with self._lock:
+            rows = self._db.execute("SELECT id, name, category, quantity, price, date_added, version FROM inventory").fetchall()
+        return [_inventory_row(row) for row in rows]
+
+    def fetch_inventory_rows(self, item_ids):
+        item_ids = list(item_ids)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, name, category, quantity, price, date_added, version FROM inventory WHERE id IN ({','.join('?' * len(item_ids))})",
+                item_ids,
+            ).fetchall() if item_ids else []
+        return [_inventory_row(row) for row in rows]
+
+    def fetch_ledger_page(self, after_id=0, limit=PAGE_SIZE):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM ledger WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+        return [_ledger_row(row) for row in rows]
+
+    # Same results as db.fetch_ledger_tail for the local mirror. The cursor is (watermark, pending
+    # ids shown): missing server ids stay gaps until no pull can fill them any more, and pending
+    # offline entries are returned every time, so replaced ones come back as removed_ids.
+    def fetch_ledger_tail(self, cursor=None, limit=PAGE_SIZE):
+        watermark, shown_pending = cursor or (LedgerWatermark(), frozenset())
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT * FROM ledger WHERE id IN (SELECT value FROM json_each(?))
+                UNION ALL
+                SELECT * FROM (SELECT * FROM ledger WHERE id > ? AND id < ? ORDER BY id LIMIT ?)
+                UNION ALL
+                SELECT * FROM ledger WHERE id >= ?
+                ORDER BY id
+                """,
+                (json.dumps(list(watermark.gaps)), watermark.high, LOCAL_LEDGER_ID, limit, LOCAL_LEDGER_ID),
+            ).fetchall()
+            settled_id = self._mirror_settled_id(self._db)
+
+        server_ids = {row[0] for row in rows if row[0] < LOCAL_LEDGER_ID}
+        pending = frozenset(row[0] for row in rows if row[0] >= LOCAL_LEDGER_ID)
+        high = max(server_ids | {watermark.high})
+        missing = (set(watermark.gaps) | set(range(watermark.high + 1, high))) - server_ids
+        gaps = {gap: 0 for gap in missing if gap > settled_id}
+        return [_ledger_row(row) for row in rows], (LedgerWatermark(high, gaps), pending), shown_pending - pending
+
+    # Every server ledger id up to here is in the mirror or will never be pulled
+    def _mirror_settled_id(self, db):
+        watermark = self._ledger_watermark(db)
+        if watermark is None:
+            return db.execute("SELECT COALESCE(MAX(id), 0) FROM ledger WHERE id < ?", (LOCAL_LEDGER_ID,)).fetchone()[0]
+        return watermark.settled_id
+
+    # How far the ledger mirror has caught up with the server (see ledger_watermark.py),
+    # or None for a mirror written before the watermark was kept
+    def _ledger_watermark(self, db):
+        row = db.execute("SELECT value FROM meta WHERE key = 'ledger_watermark'").fetchone()
+        if row:
+            return LedgerWatermark.from_json(row[0])
+        if db.execute("SELECT 1 FROM ledger WHERE id < ? LIMIT 1", (LOCAL_LEDGER_ID,)).fetchone():
+            return None
+        return LedgerWatermark()
+
+    def _save_ledger_watermark(self, db, watermark):
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ledger_watermark', ?)", (watermark.to_json(),))
+
+    # Operations still waiting to reach PostgreSQL
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    # Operations PostgreSQL refused, as (seq, operation, item_id, error, created_at)
+    def conflicts(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, operation, item_id, error, created_at FROM outbox WHERE status = 'conflict' ORDER BY seq"
+            ).fetchall()
+
+    # Mutations, same arguments and (message, row) results as db.py
+
+    def add_inventory_item(self, name, category, quantity, price):
+        error = validate_new_item(quantity, price)
+        if error:
+            return error, None
+
+        def add(db):
+            if db.execute("SELECT 1 FROM inventory WHERE name = ?", (name,)).fetchone():
+                return "Item with this name already exists!", None
+
+            # Temporary id until the insert reaches PostgreSQL
+            item_id = min(0, db.execute("SELECT COALESCE(MIN(id), 0) FROM inventory").fetchone()[0]) - 1
+            row = (item_id, name, category, quantity, str(_price(price)), datetime.now().isoformat(sep=" "), 1)
+            db.execute("INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            seq = self._queue(db, "add", item_id, name=name, category=category, quantity=quantity, price=row[4])
+            self._log(db, seq, "INSERT", item_id, name, category, None, quantity, None, row[4])
+            return "Item added successfully!", _inventory_row(row)
+
+        return self._write(add)
+
+    def update_inventory_item(self, item_id, name, category, quantity, price, expected_version=None):
+        def update(db):
+            row = self._get(db, item_id)
+            if not row:
+                return f"Error: Item with ID {item_id} does not exist.", None
+            if expected_version is not None and row[6] != expected_version:
+                return "Item was changed by another user, please reload it and try again!", None
+
+            # The local version mirrors the server's, so PostgreSQL checks the same version later
+            new_row = (item_id, name, category, quantity, str(_price(price)), row[5], row[6] + 1)
+            db.execute(
+                "UPDATE inventory SET name = ?, category = ?, quantity = ?, price = ?, version = ? WHERE id = ?",
+                (name, category, quantity, new_row[4], new_row[6], item_id),
+            )
+            seq = self._queue(db, "update", item_id, name=name, category=category, quantity=quantity, price=new_row[4], expected_version=row[6])
+            self._log(db, seq, "UPDATE", item_id, name, category, row[3], quantity, row[4], new_row[4])
+            return "Item updated successfully!", _inventory_row(new_row)
+
+        try:
+            return self._write(update)
+        except sqlite3.IntegrityError as e:
+            return f"Error updating item: {e}", None
+
+    def adjust_stock(self, item_id, delta, reason=None):
+        if delta == 0:
+            return "Adjustment must not be zero!", None
+
+        def adjust(db):
+            row = self._get(db, item_id)
+            if not row:
+                return f"Error: Item with ID {item_id} does not exist.", None
+            if row[3] + delta < 0:
+                return f"Not enough stock! Only {row[3]} on hand.", None
+
+            # Queued as a delta, so it merges with adjustments other clients made meanwhile
+            new_row = row[:3] + (row[3] + delta,) + row[4:6] + (row[6] + 1,)
+            db.execute("UPDATE inventory SET quantity = ?, version = ? WHERE id = ?", (new_row[3], new_row[6], item_id))
+            seq = self._queue(db, "adjust", item_id, delta=delta, reason=reason)
+            self._log(db, seq, "UPDATE", item_id, row[1], row[2], row[3], new_row[3], row[4], row[4], reason)
+            return "Stock adjusted successfully!", _inventory_row(new_row)
+
+        return self._write(adjust)
+
+    def delete_inventory_item(self, item_id):
+        def delete(db):
+            row = self._get(db, item_id)
+            if not row:
+                return f"Error: Item with ID {item_id} does not exist.", None
+            db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+            seq = self._queue(db, "delete", item_id)
+            self._log(db, seq, "DELETE", item_id, row[1], row[2], row[3], 0, row[4], "0")
+            return "Item deleted successfully!", _inventory_row(row)
+
+        return self._write(delete)
+
+    def bulk_update_items(self, changes):
+        if not changes:
+            return "No items selected!", []
+        if any(price is not None and price <= 0 for _, _, price in changes):
+            return "Price must be greater than 0!", []
+
+        def update(db):
+            rows = []
+            for item_id, category, price in changes:
+                row = self._get(db, item_id)
+                if not row:
+                    continue
+                price = str(_price(price)) if price is not None else None
+                new_row = row[:2] + (category or row[2], row[3], price or row[4], row[5], row[6] + 1)
+                db.execute("UPDATE inventory SET category = ?, price = ?, version = ? WHERE id = ?", (new_row[2], new_row[4], new_row[6], item_id))
+                seq = self._queue(db, "update_fields", item_id, category=category, price=price)
+                self._log(db, seq, "UPDATE", item_id, row[1], new_row[2], row[3], row[3], row[4], new_row[4])
+                rows.append(_inventory_row(new_row))
+            return f"{len(rows)} items updated successfully!", rows
+
+        return self._write(update)
+
+    def bulk_change_price_percent(self, item_ids, percent):
+        if not item_ids:
+            return "No items selected!", []
+        if percent <= -100:
+            return "Price change must be greater than -100%!", []
+
+        def reprice(db):
+            rows = []
+            for item_id in item_ids:
+                row = self._get(db, item_id)
+                if not row:
+                    continue
+
+                # Same rounding as PostgreSQL, which recomputes from its own price when synced
+                price = max(_price(Decimal(row[4]) * (1 + Decimal(str(percent)) / 100)), CENT)
+                new_row = row[:4] + (str(price), row[5], row[6] + 1)
+                db.execute("UPDATE inventory SET price = ?, version = ? WHERE id = ?", (new_row[4], new_row[6], item_id))
+                seq = self._queue(db, "reprice", item_id, percent=percent)
+                self._log(db, seq, "UPDATE", item_id, row[1], row[2], row[3], row[3], row[4], new_row[4])
+                rows.append(_inventory_row(new_row))
+            return f"{len(rows)} items repriced successfully!", rows
+
+        return self._write(reprice)
+
+    def bulk_delete_items(self, item_ids):
+        if not item_ids:
+            return "No items selected!", []
+
+        def delete(db):
+            rows = []
+            for item_id in item_ids:
+                row = self._get(db, item_id)
+                if not row:
+                    continue
+                db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+                seq = self._queue(db, "delete", item_id)
+                self._log(db, seq, "DELETE", item_id, row[1], row[2], row[3], 0, row[4], "0")
+                rows.append(_inventory_row(row))
+            return f"{len(rows)} items deleted successfully!", rows
+
+        return self._write(delete)
+
+    # Sync
+
+    # Applies one queued operation through the repository, returns the resulting Item or None
+    def _apply(self, repository, operation, item_id, payload):
+        if operation == "add":
+            return repository.add(payload["name"], payload["category"], payload["quantity"], Decimal(payload["price"]))
+        if operation == "update":
+            return repository.update(item_id, payload["name"], payload["category"], payload["quantity"],
+                                     Decimal(payload["price"]), payload["expected_version"])
+        if operation == "adjust":
+            return repository.adjust(item_id, payload["delta"], payload["reason"])
+
+        if operation == "update_fields":
+            price = Decimal(payload["price"]) if payload["price"] is not None else None
+            items = repository.update_many([(item_id, payload["category"], price)])
+        elif operation == "reprice":
+            items = repository.change_price_percent([item_id], payload["percent"])
+        elif operation == "delete":
+            # Already deleted elsewhere is the outcome we wanted
+            repository.delete_many([item_id])
+            return None
+        else:
+            raise ValueError(f"Unknown queued operation: {operation}")
+
+        # The item was deleted by another client
+        if not items:
+            raise ItemNotFound(item_id)
+        return items[0]
+
+    # Sends up to batch_size queued operations to PostgreSQL in one transaction.
+    # Refused operations (e.g. a name taken or a version changed by another client) are
+    # kept in the outbox as conflicts and their items reloaded from the server; the rest
+    # of the batch still commits. Connection errors leave the queue as it was.
+    def push(self, result, batch_size=SYNC_BATCH_SIZE):
+        with self._lock:
+            queued = self._db.execute(
+                "SELECT seq, operation, item_id, payload FROM outbox WHERE status = 'pending' ORDER BY seq LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+        if not queued:
+            return
+
+        applied = []
+        refused = []
+        id_map = {}
+        items = {}
+
+        with connection() as conn, conn.cursor() as cur:
+
+            # Every repository call joins this transaction instead of borrowing its own connection
+            repository = InventoryRepository(connect=lambda: nullcontext(conn))
+
+            # Operations a previous push committed before losing its connection
+            cur.execute(
+                "SELECT seq FROM sync_applied WHERE client_id = %s AND seq = ANY(%s)",
+                (self.client_id, [seq for seq, _, _, _ in queued]),
+            )
+            done = {row[0] for row in cur.fetchall()}
+
+            for seq, operation, item_id, payload in queued:
+                if seq in done:
+                    applied.append(seq)
+                    continue
+                server_id = id_map.get(item_id, item_id)
+
+                cur.execute("SAVEPOINT queued_operation")
+                try:
+                    item = self._apply(repository, operation, server_id, json.loads(payload))
+                except (InventoryError, psycopg2.IntegrityError, psycopg2.DataError) as e:
+                    # Only this operation is undone, e.g. a rename onto a name another client took
+                    cur.execute("ROLLBACK TO SAVEPOINT queued_operation")
+                    refused.append((seq, operation, item_id, str(e)))
+                    continue
+
+                cur.execute("RELEASE SAVEPOINT queued_operation")
+                cur.execute("INSERT INTO sync_applied (client_id, seq) VALUES (%s, %s)", (self.client_id, seq))
+                applied.append(seq)
+                if operation == "add":
+                    id_map[item_id] = item.id
+                if item is not None:
+                    items[item.id] = item
+
+        # Committed: update the outbox and bring synced rows in line with the server
+        def record(db):
+            db.executemany("DELETE FROM outbox WHERE seq = ?", [(seq,) for seq in applied])
+
+            # Pending ledger entries are replaced by the server's on the next pull, or were refused
+            removed = db.executemany(
+                "DELETE FROM ledger WHERE id = ?",
+                [(LOCAL_LEDGER_ID + seq,) for seq in applied + [seq for seq, _, _, _ in refused]],
+            ).rowcount
+            result.ledger_rows += max(removed, 0)
+            db.executemany(
+                "UPDATE outbox SET status = 'conflict', error = ? WHERE seq = ?",
+                [(error, seq) for seq, _, _, error in refused],
+            )
+
+            # Items added offline take their permanent id
+            for temp_id, server_id in id_map.items():
+                db.execute("DELETE FROM inventory WHERE id = ?", (server_id,))
+                db.execute("UPDATE inventory SET id = ? WHERE id = ?", (server_id, temp_id))
+                db.execute("UPDATE outbox SET item_id = ? WHERE item_id = ?", (server_id, temp_id))
+                db.execute("UPDATE ledger SET item_id = ? WHERE item_id = ?", (server_id, temp_id))
+                result.changed_ids.update((temp_id, server_id))
+
+            # Server values win unless newer local changes are still queued
+            for item in items.values():
+                if not self._has_pending(db, item.id):
+                    db.execute("INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)", _local_values(item))
+                    result.changed_ids.add(item.id)
+
+        self._write(record)
+        result.pushed += len(applied)
+        result.conflicts.extend(refused)
+
+        # Refused changes are undone locally by reloading what the server has
+        if refused:
+            self.pull_items({id_map.get(item_id, item_id) for _, _, item_id, _ in refused}, result)
+
+    def _has_pending(self, db, item_id):
+        return db.execute("SELECT 1 FROM outbox WHERE item_id = ? AND status = 'pending' LIMIT 1", (item_id,)).fetchone() is not None
+
+    # Copies the current server rows for some ids into the local store; ids the server no
+    # longer has are removed. Items with queued local changes are left alone.
+    def pull_items(self, item_ids, result):
+        server_ids = [item_id for item_id in item_ids if item_id > 0]
+        rows = fetch_inventory_rows(server_ids) if server_ids else []
+
+        def store(db):
+            found = set()
+            for row in rows:
+                found.add(row[0])
+                if not self._has_pending(db, row[0]):
+                    db.execute("INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)", _local_values(row))
+                    result.changed_ids.add(row[0])
+            for item_id in item_ids:
+                if item_id not in found and not self._has_pending(db, item_id):
+                    db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+                    result.changed_ids.add(item_id)
+
+        self._write(store)
+
+    # Replaces the local inventory with the server's, keeping items with queued changes
+    def pull_all(self, result):
+        rows = list(stream_inventory())
+
+        def store(db):
+            pending = {row[0] for row in db.execute("SELECT DISTINCT item_id FROM outbox WHERE status = 'pending'")}
+            db.execute("DELETE FROM inventory WHERE id > 0 AND id NOT IN (SELECT item_id FROM outbox WHERE status = 'pending')")
+            db.executemany(
+                "INSERT OR IGNORE INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_local_values(row) for row in rows if row[0] not in pending),
+            )
+
+        self._write(store)
+
+    # Copies ledger entries the mirror doesn't have yet, a page at a time, from where the last
+    # pull stopped. The watermark is saved with each page, so nothing is read twice and entries
+    # that commit out of id order are still picked up. Errors are raised and nothing is lost.
+    def pull_ledger(self, result, limit=LEDGER_PULL_SIZE):
+        with self._lock:
+            watermark = self._ledger_watermark(self._db)
+        if watermark is None:
+            self.rebuild_ledger(result, limit)
+            return
+
+        while True:
+            rows, watermark, _ = fetch_ledger_tail(watermark, limit)
+
+            def store(db):
+                inserted = db.executemany(
+                    "INSERT OR IGNORE INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (_local_values(row[:11]) for row in rows),
+                ).rowcount if rows else 0
+                self._save_ledger_watermark(db, watermark)
+                return inserted
+
+            result.ledger_rows += self._write(store)
+            if len(rows) < limit:
+                return
+
+    # Replaces the mirrored server ledger with a fresh copy, used for mirrors written before the
+    # watermark was kept (they could have skipped late entries). Pages go to a staging table and
+    # replace the mirror in one transaction at the end, so a failure leaves the old copy in place.
+    def rebuild_ledger(self, result, limit=LEDGER_PULL_SIZE):
+        def stage(db):
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS ledger_staging AS SELECT * FROM ledger WHERE 0")
+            db.execute("DELETE FROM ledger_staging")
+
+        self._write(stage)
+
+        watermark = LedgerWatermark()
+        while True:
+            rows, watermark, _ = fetch_ledger_tail(watermark, limit)
+            if rows:
+                self._write(lambda db: db.executemany(
+                    "INSERT OR IGNORE INTO ledger_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (_local_values(row[:11]) for row in rows),
+                ))
+            if len(rows) < limit:
+                break
+
+        def replace(db):
+            db.execute("DELETE FROM ledger WHERE id < ?", (LOCAL_LEDGER_ID,))
+            count = db.execute("INSERT INTO ledger SELECT * FROM ledger_staging").rowcount
+            db.execute("DELETE FROM ledger_staging")
+            self._save_ledger_watermark(db, watermark)
+            return count
+
+        result.ledger_rows += self._write(replace)
+
+    # Pulls what a ChangeBatch from the listener says other clients changed
+    @timed
+    def pull_changes(self, batch):
+        result = SyncResult()
+        if batch.resync or batch.inventory_reload:
+            self.pull_all(result)
+        elif batch.inventory_ids:
+            self.pull_items(batch.inventory_ids, result)
+        if batch.ledger_changed or batch.resync:
+            self.pull_ledger(result)
+        return result
+
+    # One round of write-behind sync: pushes queued operations, then catches the ledger
+    # mirror up. With full, the whole inventory is reloaded from the server first.
+    # Raises on connection errors; everything queued stays queued for the next round.
+    @timed
+    def sync(self, full=False):
+        result = SyncResult()
+        if full:
+            self.pull_all(result)
+        self.push(result)
+        self.pull_ledger(result)
+        result.pending = self.pending_count()
+        return result
@@ -1,6 +1,26 @@
+import time
+
+# Process start time, used to report how long startup takes
+STARTED = time.perf_counter()
+
 import tkinter as tk
+from tkinter import messagebox
+import db
 from inventory_page import InventoryPage
-from ledger_page import LedgerPage
+from db_pool import close_pool
+from worker import DbWorker
+from listener import ChangeListener, ChangeBatch
+from local_store import LocalStore, LOCAL_DB_PATH
+from snapshots import maybe_take_snapshot
+from partitions import ensure_partitions
+from metrics import metrics, METRICS_FILE
+
+# How often (ms) queued local changes are pushed to PostgreSQL, and the longest wait after failures
+SYNC_INTERVAL_MS = 2000
+MAX_SYNC_INTERVAL_MS = 60000
+
+# How often (ms) metrics are written to METRICS_FILE, if set
+METRICS_DUMP_INTERVAL_MS = 15000
 
 class App(tk.Tk):
     def __init__(self):
@@ -10,26 +30,173 @@ class App(tk.Tk):
         self.title("Inventory Management System")
         self.state("zoomed")
 
+        # Background executor for database calls so the window never blocks on the network
+        self.worker = DbWorker(self)
+
+        # Change notifications from other clients, applied by each page as deltas
+        self.listener = ChangeListener(self)
+        self.listener.start()
+
+        # Where pages read and write: a local SQLite store synced in the background when
+        # LOCAL_DB_PATH is set, otherwise PostgreSQL directly (db.py)
+        self.store = LocalStore(LOCAL_DB_PATH) if LOCAL_DB_PATH else None
+        self.data = self.store or db
+        self.sync_interval = SYNC_INTERVAL_MS
+        self.sync_after_id = None
+
+        # The local inventory is reloaded from the server once per run; rounds keep asking for
+        # it until one succeeds, so a client started offline still catches up when back online
+        self.full_sync_owed = True
+        if self.store:
+            # Other clients' changes are pulled into the store before pages see them
+            self.listener.relay = self.on_remote_changes
+            self.after_idle(self.sync)
+
         # Create a container to hold the frames/views
         self.container = tk.Frame(self)
         self.container.pack(fill="both", expand=True)
 
-        # Initialize frames/views
+        # Frames/views are created the first time they are shown
         self.frames = {}
-        for F in (InventoryPage, LedgerPage):
-            frame = F(self.container, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+
+        # Startup milestones already reported
+        self.startup_marks = set()
 
         # Show inventory page on load
         self.show_frame(InventoryPage)
 
+        # Report once the first frame has been painted, before any data arrives
+        self.after_idle(lambda: self.mark_startup("window painted"))
+
+        # Checkpoint the inventory in the background if enough ledger history has built up
+        self.after_idle(lambda: self.worker.submit(maybe_take_snapshot, key="snapshot"))
+
+        # Make sure the ledger has partitions ready for the coming months
+        self.after_idle(lambda: self.worker.submit(ensure_partitions, key="partitions"))
+
+        # Live metrics window, F12 opens it from anywhere
+        self.diagnostics = None
+        self.bind_all("<F12>", lambda event: self.open_diagnostics())
+
+        # Keep a metrics file fresh for monitoring
+        self.metrics_after_id = None
+        if METRICS_FILE:
+            self.metrics_after_id = self.after(METRICS_DUMP_INTERVAL_MS, self.dump_metrics)
+
+        # Stop background jobs before the window is destroyed
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
     # Function to navigate between frames/views
     def show_frame(self, page):
-        frame = self.frames[page]
+        frame = self.frames.get(page)
+
+        # Build the frame on first navigation
+        if frame is None:
+            frame = page(self.container, self)
+            self.frames[page] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+
         frame.tkraise()
 
+    # Prints how long after process start a startup milestone was reached (once per milestone)
+    def mark_startup(self, milestone):
+        if milestone in self.startup_marks:
+            return
+        self.startup_marks.add(milestone)
+        print(f"Startup: {milestone} after {(time.perf_counter() - STARTED) * 1000:.0f} ms")
+
+    # Opens the diagnostics window, or brings it to the front if it is already open
+    def open_diagnostics(self):
+        from diagnostics import DiagnosticsWindow
+        if self.diagnostics is None or not self.diagnostics.winfo_exists():
+            self.diagnostics = DiagnosticsWindow(self)
+        self.diagnostics.lift()
+
+    # Rewrites METRICS_FILE and schedules the next dump
+    def dump_metrics(self):
+        try:
+            metrics.dump(METRICS_FILE)
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+        self.metrics_after_id = self.after(METRICS_DUMP_INTERVAL_MS, self.dump_metrics)
+
+    # Runs one round of local store sync in the background
+    def sync(self):
+        self.sync_after_id = None
+        full = self.full_sync_owed
+        self.worker.submit(
+            self.store.sync, full, key="sync", group="sync",
+            on_success=lambda result: self.on_synced(result, full), on_error=self.on_sync_failed,
+        )
+
+    # Tells pages about rows the sync changed and schedules the next round
+    def on_synced(self, result, full):
+        self.sync_interval = SYNC_INTERVAL_MS
+        if full:
+            self.full_sync_owed = False
+        batch = ChangeBatch()
+        batch.resync = full
+        batch.inventory_ids = result.changed_ids
+        batch.ledger_changed = result.ledger_rows > 0
+        if full or batch.inventory_ids or batch.ledger_changed:
+            self.listener.publish(batch)
+
+        if result.conflicts:
+            lines = [f"{operation} of item {item_id}: {error}" for _, operation, item_id, error in result.conflicts[:10]]
+            messagebox.showwarning("Sync", "Some offline changes were refused and undone:\n" + "\n".join(lines))
+
+        # Keep pushing straight away while a backlog remains
+        self.schedule_sync(0 if result.pending else self.sync_interval)
+
+    # Offline or slow: keep working locally and retry later, backing off up to a limit
+    def on_sync_failed(self, error):
+        print(f"Sync failed, {self.store.pending_count()} changes queued: {error}")
+        self.sync_interval = min(self.sync_interval * 2, MAX_SYNC_INTERVAL_MS)
+        self.schedule_sync(self.sync_interval)
+
+    def schedule_sync(self, delay):
+        if self.sync_after_id is None:
+            self.sync_after_id = self.after(delay, self.sync)
+
+    # Pulls changes from other clients into the local store, then passes them on to the pages
+    def on_remote_changes(self, batch):
+        self.worker.submit(
+            self.store.pull_changes, batch, group="sync",
+            on_success=lambda result: self.on_remote_changes_pulled(batch),
+            on_error=lambda error: self.on_remote_pull_failed(batch, error),
+        )
+
+    def on_remote_changes_pulled(self, batch):
+        # A resync reloads the whole inventory, which is what a full sync would do
+        if batch.resync:
+            self.full_sync_owed = False
+        self.listener.publish(batch)
+
+    # Changes that couldn't be pulled are picked up by a full sync in the next round
+    def on_remote_pull_failed(self, batch, error):
+        print(f"Error pulling remote changes: {error}")
+        self.full_sync_owed = True
+
+    # Function to shut down cleanly when the window is closed
+    def on_close(self):
+        self.listener.stop()
+        if self.sync_after_id is not None:
+            self.after_cancel(self.sync_after_id)
+        if self.metrics_after_id is not None:
+            self.after_cancel(self.metrics_after_id)
+        self.worker.shutdown()
+        if self.store:
+            self.store.close()
+        self.destroy()
+
 # Run the application
 if __name__ == "__main__":
     app = App()
     app.mainloop()
+
+    # Close pooled database connections on exit
+    close_pool()
+
+    # Leave the final numbers behind for monitoring
+    if METRICS_FILE:
+        metrics.dump(METRICS_FILE)
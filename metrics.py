@@ -0,0 +1,152 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Statements slower than this (ms) are logged with their SQL text
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Optional file the app rewrites with every metric, in Prometheus text format
+METRICS_FILE = os.getenv("METRICS_FILE")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Slow statements kept for the diagnostics panel
+SLOW_QUERY_LIMIT = 100
+
+# Longest SQL text kept per slow statement
+SQL_TEXT_LIMIT = 2000
+
+
+# Latency distribution with fixed buckets, cheap enough to update on every call
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Estimated quantile (0..1) in seconds: the upper bound of the bucket it falls in
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# Thread-safe registry of histograms and counters. Metrics are keyed by name and
+# an optional set of labels, e.g. observe("db_call_seconds", 0.01, function="add_inventory_item").
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LIMIT)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    # Records a statement that took longer than SLOW_QUERY_MS
+    def slow_query(self, seconds, sql):
+        sql = " ".join(sql.split())[:SQL_TEXT_LIMIT]
+        with self._lock:
+            self.slow_queries.append((time.time(), seconds, sql))
+        print(f"Slow query ({seconds * 1000:.0f} ms): {sql}")
+
+    # Copies of everything recorded so far as (histograms, counters, slow_queries)
+    def snapshot(self):
+        with self._lock:
+            histograms = {}
+            for key, histogram in self.histograms.items():
+                copy = Histogram()
+                copy.counts = list(histogram.counts)
+                copy.count, copy.total, copy.max = histogram.count, histogram.total, histogram.max
+                histograms[key] = copy
+            return histograms, dict(self.counters), list(self.slow_queries)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.slow_queries.clear()
+
+    # Everything recorded so far in the Prometheus text exposition format
+    def render(self):
+        histograms, counters, _ = self.snapshot()
+        lines = []
+        for (name, labels), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for (name, labels), value in sorted(counters.items()):
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Writes render() to a file, replacing it atomically so collectors never read half a file
+    def dump(self, path=METRICS_FILE):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(temp_path, path)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+# Shared registry used by the whole app
+metrics = Metrics()
+
+
+# Decorator that records how long every call takes in db_call_seconds{function=...}
+# and counts calls that raise in db_call_errors_total
+def timed(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            metrics.increment("db_call_errors_total", function=name)
+            raise
+        finally:
+            metrics.observe("db_call_seconds", time.perf_counter() - started, function=name)
+
+    return wrapper
@@ -0,0 +1,437 @@
+import argparse
+from db_pool import connection
+
+# Arbitrary key for the advisory lock that stops two clients migrating at once
+MIGRATION_LOCK_ID = 7730001
+
+# Ordered schema migrations as (version, description, statements).
+# Applied versions are recorded in schema_migrations, so every migration runs
+# exactly once per database. Never edit an applied migration, add a new one.
+MIGRATIONS = [
+    (1, "Create inventory and ledger tables", [
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
+            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ledger (
+            id SERIAL PRIMARY KEY,
+            operation_type VARCHAR(10) NOT NULL CHECK (operation_type IN ('INSERT', 'UPDATE', 'DELETE')),
+            item_name VARCHAR(100) NOT NULL,
+            category VARCHAR(50),
+            previous_quantity INTEGER,
+            new_quantity INTEGER,
+            previous_price DECIMAL(10,2),
+            new_price DECIMAL(10,2),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    # Item names are unique, add_inventory_item relies on this for ON CONFLICT
+    (2, "Unique index on inventory.name", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS inventory_name_key ON inventory (name)",
+    ]),
+    # Indexes for ledger filtering by item, by date range and inventory filtering by category
+    (3, "Indexes for ledger history and category lookups", [
+        "CREATE INDEX IF NOT EXISTS ledger_item_name_timestamp_idx ON ledger (item_name, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ledger_timestamp_idx ON ledger (timestamp)",
+        "CREATE INDEX IF NOT EXISTS inventory_category_idx ON inventory (category)",
+    ]),
+    # Push changes to other clients: one NOTIFY per changed inventory row carrying its id and
+    # operation, and one per ledger-writing statement (identical payloads collapse per transaction)
+    (4, "NOTIFY inventory_changes on inventory and ledger writes", [
+        """
+        CREATE OR REPLACE FUNCTION notify_inventory_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('inventory_changes', json_build_object(
+                'table', 'inventory',
+                'op', TG_OP,
+                'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION notify_ledger_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('inventory_changes', json_build_object('table', 'ledger', 'op', TG_OP)::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS inventory_notify ON inventory",
+        """
+        CREATE TRIGGER inventory_notify AFTER INSERT OR UPDATE OR DELETE ON inventory
+        FOR EACH ROW EXECUTE FUNCTION notify_inventory_change()
+        """,
+        "DROP TRIGGER IF EXISTS ledger_notify ON ledger",
+        """
+        CREATE TRIGGER ledger_notify AFTER INSERT ON ledger
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_ledger_change()
+        """,
+    ]),
+    # Row versions for optimistic locking of full edits, and a reason for stock adjustments
+    (5, "inventory.version and ledger.reason", [
+        "ALTER TABLE inventory ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE ledger ADD COLUMN IF NOT EXISTS reason VARCHAR(255)",
+    ]),
+    # Ledger rows remember which item they belong to (names can change), existing rows are
+    # matched by name where the item still exists. Snapshots checkpoint the whole inventory
+    # so point-in-time queries only replay the ledger written after the nearest one.
+    (6, "ledger.item_id and inventory snapshots", [
+        "ALTER TABLE ledger ADD COLUMN IF NOT EXISTS item_id INTEGER",
+        "UPDATE ledger SET item_id = inventory.id FROM inventory WHERE ledger.item_id IS NULL AND ledger.item_name = inventory.name",
+        "CREATE INDEX IF NOT EXISTS ledger_item_id_idx ON ledger (item_id)",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_snapshots (
+            id SERIAL PRIMARY KEY,
+            taken_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ledger_id INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS inventory_snapshots_taken_at_idx ON inventory_snapshots (taken_at)",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_snapshot_items (
+            snapshot_id INTEGER NOT NULL REFERENCES inventory_snapshots (id) ON DELETE CASCADE,
+            item_id INTEGER NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            category VARCHAR(50),
+            quantity INTEGER NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            PRIMARY KEY (snapshot_id, item_id)
+        )
+        """,
+    ]),
+    # Reporting aggregates. Stock by category is kept exact by a trigger on inventory;
+    # daily movement is folded in from ledger rows newer than report_state.last_ledger_id.
+    (7, "Reporting aggregates", [
+        # Hold off inventory writers until the trigger exists, so the initial totals stay exact
+        "LOCK TABLE inventory IN SHARE ROW EXCLUSIVE MODE",
+        """
+        CREATE TABLE IF NOT EXISTS category_stock (
+            category VARCHAR(50) PRIMARY KEY,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            units BIGINT NOT NULL DEFAULT 0,
+            stock_value DECIMAL(16,2) NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT INTO category_stock (category, item_count, units, stock_value)
+        SELECT category, COUNT(*), SUM(quantity), SUM(quantity * price) FROM inventory GROUP BY category
+        ON CONFLICT (category) DO NOTHING
+        """,
+        """
+        CREATE OR REPLACE FUNCTION maintain_category_stock() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE category_stock
+                SET item_count = item_count - 1,
+                    units = units - OLD.quantity,
+                    stock_value = stock_value - OLD.quantity * OLD.price
+                WHERE category = OLD.category;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO category_stock (category, item_count, units, stock_value)
+                VALUES (NEW.category, 1, NEW.quantity, NEW.quantity * NEW.price)
+                ON CONFLICT (category) DO UPDATE
+                SET item_count = category_stock.item_count + 1,
+                    units = category_stock.units + EXCLUDED.units,
+                    stock_value = category_stock.stock_value + EXCLUDED.stock_value;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS inventory_category_stock ON inventory",
+        """
+        CREATE TRIGGER inventory_category_stock AFTER INSERT OR UPDATE OR DELETE ON inventory
+        FOR EACH ROW EXECUTE FUNCTION maintain_category_stock()
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_movement (
+            day DATE NOT NULL,
+            item_name VARCHAR(100) NOT NULL,
+            units_in BIGINT NOT NULL DEFAULT 0,
+            units_out BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, item_name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS report_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_ledger_id INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT INTO report_state (id, last_ledger_id) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    ]),
+    # Monthly range partitions of the ledger on timestamp, so date-filtered reads only touch
+    # the months they ask for and old months can be detached or archived (see partitions.py).
+    # Rows outside every monthly partition land in ledger_default; create_ledger_partition
+    # moves them into their month when it is created. The id sequence is kept as it is.
+    (8, "Partition ledger by month", [
+        "LOCK TABLE ledger IN ACCESS EXCLUSIVE MODE",
+        "ALTER TABLE ledger RENAME TO ledger_unpartitioned",
+        "ALTER SEQUENCE ledger_id_seq OWNED BY NONE",
+        """
+        CREATE TABLE ledger (
+            id INTEGER NOT NULL DEFAULT nextval('ledger_id_seq'),
+            operation_type VARCHAR(10) NOT NULL CHECK (operation_type IN ('INSERT', 'UPDATE', 'DELETE')),
+            item_name VARCHAR(100) NOT NULL,
+            category VARCHAR(50),
+            previous_quantity INTEGER,
+            new_quantity INTEGER,
+            previous_price DECIMAL(10,2),
+            new_price DECIMAL(10,2),
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            reason VARCHAR(255),
+            item_id INTEGER,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """,
+        "ALTER SEQUENCE ledger_id_seq OWNED BY ledger.id",
+        "CREATE TABLE ledger_default PARTITION OF ledger DEFAULT",
+        """
+        CREATE OR REPLACE FUNCTION create_ledger_partition(month DATE) RETURNS TEXT AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', month)::date;
+            month_end DATE := (date_trunc('month', month) + INTERVAL '1 month')::date;
+            partition_name TEXT := 'ledger_' || to_char(month, 'YYYY_MM');
+        BEGIN
+            IF to_regclass(partition_name) IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE ledger INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM ledger_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name);
+            EXECUTE format('ALTER TABLE ledger ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end);
+            RETURN partition_name;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION ensure_ledger_partitions(months_ahead INTEGER) RETURNS SETOF TEXT AS $$
+            SELECT created FROM (
+                SELECT create_ledger_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => n))::date) AS created
+                FROM generate_series(0, months_ahead) AS n
+            ) partitions
+            WHERE created IS NOT NULL
+        $$ LANGUAGE sql
+        """,
+        """
+        SELECT create_ledger_partition(month)
+        FROM (SELECT DISTINCT date_trunc('month', timestamp)::date AS month FROM ledger_unpartitioned WHERE timestamp IS NOT NULL) months
+        """,
+        "SELECT ensure_ledger_partitions(3)",
+        """
+        INSERT INTO ledger (id, operation_type, item_name, category, previous_quantity, new_quantity,
+                            previous_price, new_price, timestamp, reason, item_id)
+        SELECT id, operation_type, item_name, category, previous_quantity, new_quantity,
+               previous_price, new_price, COALESCE(timestamp, 'epoch'), reason, item_id
+        FROM ledger_unpartitioned
+        """,
+        "DROP TABLE ledger_unpartitioned",
+        "CREATE INDEX IF NOT EXISTS ledger_item_name_timestamp_idx ON ledger (item_name, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ledger_timestamp_idx ON ledger (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ledger_item_id_idx ON ledger (item_id)",
+        """
+        CREATE TRIGGER ledger_notify AFTER INSERT ON ledger
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_ledger_change()
+        """,
+    ]),
+    # Operations pushed from local stores (see local_store.py), recorded in the same transaction
+    # so a batch resent after a lost connection is never applied twice
+    (9, "Sync bookkeeping for local stores", [
+        """
+        CREATE TABLE IF NOT EXISTS sync_applied (
+            client_id VARCHAR(36) NOT NULL,
+            seq BIGINT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (client_id, seq)
+        )
+        """,
+    ]),
+    # Maintain category_stock once per statement from transition tables instead of once per row.
+    # Row triggers updated the same few category rows for every item, so bulk writes slowed
+    # down quadratically (100k imported rows took nearly a minute). Transition tables can only
+    # belong to single-event triggers, hence three of them.
+    (10, "Statement-level category_stock maintenance", [
+        "DROP TRIGGER IF EXISTS inventory_category_stock ON inventory",
+        """
+        CREATE OR REPLACE FUNCTION maintain_category_stock() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE category_stock
+                SET item_count = category_stock.item_count - removed.item_count,
+                    units = category_stock.units - removed.units,
+                    stock_value = category_stock.stock_value - removed.stock_value
+                FROM (
+                    SELECT category, COUNT(*) AS item_count, SUM(quantity) AS units, SUM(quantity * price) AS stock_value
+                    FROM old_rows GROUP BY category
+                ) AS removed
+                WHERE category_stock.category = removed.category;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO category_stock (category, item_count, units, stock_value)
+                SELECT category, COUNT(*), SUM(quantity), SUM(quantity * price) FROM new_rows GROUP BY category
+                ON CONFLICT (category) DO UPDATE
+                SET item_count = category_stock.item_count + EXCLUDED.item_count,
+                    units = category_stock.units + EXCLUDED.units,
+                    stock_value = category_stock.stock_value + EXCLUDED.stock_value;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER inventory_category_stock_insert AFTER INSERT ON inventory
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stock()
+        """,
+        """
+        CREATE TRIGGER inventory_category_stock_update AFTER UPDATE ON inventory
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stock()
+        """,
+        """
+        CREATE TRIGGER inventory_category_stock_delete AFTER DELETE ON inventory
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_category_stock()
+        """,
+    ]),
+    # Ledger ids the movement aggregate is still waiting for (see ledger_watermark.py), so reports
+    # catch up without locking the ledger against writers. last_ledger_id is the watermark's high.
+    (11, "Watermark gaps for report_state", [
+        "ALTER TABLE report_state ADD COLUMN IF NOT EXISTS ledger_gaps JSONB NOT NULL DEFAULT '{}'",
+    ]),
+    # Ledger ids at or below a snapshot's ledger_id that it doesn't include because their writers
+    # hadn't committed yet, so snapshots are taken without locking the ledger (see snapshots.py)
+    (12, "Watermark gaps for inventory_snapshots", [
+        "ALTER TABLE inventory_snapshots ADD COLUMN IF NOT EXISTS ledger_gaps JSONB NOT NULL DEFAULT '{}'",
+    ]),
+    # One NOTIFY per inventory-writing statement instead of one per row: the ids it changed, or
+    # when there are more than 100 a single 'reload' so clients refetch everything once instead
+    # of fetching the ids in bulk. Each carries the writer's application_name so the client that
+    # made the change can skip its own notifications.
+    (13, "Statement-level inventory notifications", [
+        "DROP TRIGGER IF EXISTS inventory_notify ON inventory",
+        "DROP FUNCTION IF EXISTS notify_inventory_change()",
+        """
+        CREATE OR REPLACE FUNCTION notify_inventory_changes() RETURNS trigger AS $$
+        DECLARE
+            ids INTEGER[];
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                SELECT array_agg(id) INTO ids FROM (SELECT id FROM old_rows LIMIT 101) changed;
+            ELSE
+                SELECT array_agg(id) INTO ids FROM (SELECT id FROM new_rows LIMIT 101) changed;
+            END IF;
+
+            IF ids IS NULL THEN
+                RETURN NULL;
+            ELSIF cardinality(ids) > 100 THEN
+                PERFORM pg_notify('inventory_changes', json_build_object(
+                    'table', 'inventory', 'op', 'reload', 'client', current_setting('application_name')
+                )::text);
+            ELSE
+                PERFORM pg_notify('inventory_changes', json_build_object(
+                    'table', 'inventory', 'op', TG_OP, 'ids', ids, 'client', current_setting('application_name')
+                )::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER inventory_notify_insert AFTER INSERT ON inventory
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_changes()
+        """,
+        """
+        CREATE TRIGGER inventory_notify_update AFTER UPDATE ON inventory
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_changes()
+        """,
+        """
+        CREATE TRIGGER inventory_notify_delete AFTER DELETE ON inventory
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_changes()
+        """,
+    ]),
+]
+
+
+# Returns the set of migration versions already applied to the database
+def applied_versions(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+# Applies every pending migration in order, each in its own transaction.
+# Returns the list of versions that were applied by this call.
+def apply_migrations():
+    applied = []
+    with connection() as conn, conn.cursor() as cur:
+
+        # Serialize concurrent migrators with a session lock that outlives the per-migration commits
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            done = applied_versions(cur)
+            conn.commit()
+
+            for version, description, statements in MIGRATIONS:
+                if version in done:
+                    continue
+
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+                conn.commit()
+                applied.append(version)
+        finally:
+            conn.rollback()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+
+    return applied
+
+
+# Returns (version, description, applied) for every known migration
+def migration_status():
+    with connection() as conn, conn.cursor() as cur:
+        done = applied_versions(cur)
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+
+
+# Run the script to bring a database up to the latest schema
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.status:
+        for version, description, is_applied in migration_status():
+            print(f"{version:>4}  {'applied' if is_applied else 'pending':<8} {description}")
+    else:
+        versions = apply_migrations()
+        print(f"Applied migrations: {versions}" if versions else "Schema is up to date.")
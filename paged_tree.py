@@ -0,0 +1,291 @@
+import time
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+from metrics import metrics
+
+# Fetch the next page once the user has scrolled past this fraction of the loaded rows
+LOAD_MORE_THRESHOLD = 0.9
+
+# Rows inserted per idle callback, so a large page paints progressively instead of freezing the window
+RENDER_CHUNK_SIZE = 100
+
+# How timestamps are shown in every table
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# Formats a datetime from the database (or local store) for display, without a round trip through str()
+def format_timestamp(value):
+    return value.strftime(TIMESTAMP_FORMAT) if value is not None else ""
+
+
+# Keyset paging: the next page starts after the id of the last row loaded
+def next_after_id(cursor, rows):
+    return rows[-1][0]
+
+# Offset paging: the next page starts after the number of rows loaded so far
+def next_offset(cursor, rows):
+    return cursor + len(rows)
+
+
+# Windowed Treeview: rows are pulled from the database one keyset page at a time
+# and only materialized when the user scrolls near the end of what is loaded,
+# so opening a table with hundreds of thousands of rows costs a single page.
+# A loaded page is inserted RENDER_CHUNK_SIZE rows per idle callback so the window keeps painting.
+#
+# fetch_page(cursor, limit) must return rows with the id first; the cursor starts
+# at 0 and is advanced by next_cursor (keyset by id unless told otherwise).
+# format_row(row) turns a database row into the tuple of Treeview values.
+# Without a worker, pages are fetched synchronously (e.g. from an in-memory list).
+#
+# With tail, fetch_page(cursor, limit) returns (rows, next_cursor, removed_ids) itself and the
+# cursor starts at None (see db.fetch_ledger_tail). Rows can belong before ones already shown,
+# e.g. ledger entries that committed late, and are put in id order; removed_ids are dropped.
+# refresh() then asks again even before the user has scrolled to the end.
+class PagedTreeview:
+    def __init__(self, tree, scrollbar, worker, fetch_page, format_row, key, group,
+                 page_size=200, on_error=None, next_cursor=next_after_id, tail=False):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.worker = worker
+        self.fetch_page = fetch_page
+        self.format_row = format_row
+        self.key = key
+        self.group = group
+        self.page_size = page_size
+        self.on_error = on_error
+        self.next_cursor = next_cursor
+        self.tail = tail
+
+        # Where the next page starts and whether the table has been fully read
+        self.cursor = None if tail else 0
+        self.loaded = False
+        self.exhausted = False
+        self.loading = False
+
+        # Rows of the current page still waiting to be inserted, and the scheduled idle callback
+        self.pending_rows = []
+        self.pending_index = 0
+        self.render_id = None
+        self.render_seconds = 0.0
+
+        # Rows asked for by the latest request
+        self.limit = page_size
+
+        # With tail: the ids shown in table order, the cursor and removed ids the pending page
+        # came with, and how many of its rows weren't shown yet
+        self.ids = []
+        self.pending_cursor = None
+        self.pending_removed = ()
+        self.inserted = 0
+
+        # Hook the scroll position so more rows can be fetched on demand
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self.scrollbar.configure(command=self.tree.yview)
+
+    # Throws away what is loaded and fetches the first page again.
+    # With keep_position, local tables refill as many rows as were shown and keep their scroll offset.
+    def reload(self, keep_position=False):
+        if keep_position and self.worker is None:
+            shown = len(self.tree.get_children())
+            first = self.tree.yview()[0]
+            self.loading = True
+            self.on_page_loaded(self.fetch_page(0, max(self.page_size, shown)), replace=True)
+
+            # Refill in one go, a chunked refill would show the top of the table until it finished
+            self.flush_render()
+            self.tree.yview_moveto(first)
+            return
+
+        self.request_page(None if self.tail else 0, replace=True)
+
+    # Appends rows added since the last load without touching what is already shown.
+    # If the user hasn't scrolled to the end yet, newer rows arrive with the next page anyway;
+    # with tail, rows that belong among the loaded ones are still fetched.
+    def refresh(self):
+        if not self.loaded:
+            self.reload()
+        elif self.tail and not self.loading:
+            self.request_page(self.cursor, replace=False, limit=self.page_size if self.exhausted else 0)
+        elif self.exhausted and not self.loading:
+            self.exhausted = False
+            self.load_more()
+
+    # Fetches the page after the last loaded row
+    def load_more(self):
+        if self.loading or self.exhausted:
+            return
+
+        self.request_page(self.cursor, replace=False)
+
+    def request_page(self, cursor, replace, limit=None):
+        self.loading = True
+        limit = self.page_size if limit is None else limit
+
+        # Local pages are cheap enough to fetch inline
+        if self.worker is None:
+            self.on_page_loaded(self.fetch_page(cursor, limit), replace, limit)
+            return
+
+        self.worker.submit(
+            self.fetch_page, cursor, limit, key=self.key, group=self.group,
+            on_success=lambda result: self.on_page_loaded(result, replace, limit),
+            on_error=self.on_load_error,
+        )
+
+    def on_page_loaded(self, result, replace, limit=None):
+        self.cancel_render()
+        self.loaded = True
+        self.limit = self.page_size if limit is None else limit
+
+        # Clear the table in one call when a fresh first page arrives
+        if replace:
+            self.tree.delete(*self.tree.get_children())
+            self.cursor = None if self.tail else 0
+            self.ids = []
+
+        rows = result
+        if self.tail:
+            rows, self.pending_cursor, self.pending_removed = result
+            self.inserted = 0
+
+        # The first chunk goes in right away, the rest on later idle callbacks
+        self.pending_rows = rows
+        self.pending_index = 0
+        self.render_seconds = 0.0
+        self.render_chunk()
+
+    # Inserts the next RENDER_CHUNK_SIZE pending rows and schedules the chunk after it
+    def render_chunk(self):
+        self.render_id = None
+
+        # The table may have been closed while chunks were still scheduled
+        if not self.tree.winfo_exists():
+            return
+
+        started = time.perf_counter()
+        end = self.pending_index + RENDER_CHUNK_SIZE
+        format_row = self.format_row
+        insert = self.tree.insert
+
+        # Row ids double as Treeview item ids
+        if self.tail:
+            for row in self.pending_rows[self.pending_index:end]:
+                self.put_row(row)
+        else:
+            for row in self.pending_rows[self.pending_index:end]:
+                insert("", "end", iid=str(row[0]), values=format_row(row))
+        self.pending_index = end
+        self.render_seconds += time.perf_counter() - started
+
+        if end < len(self.pending_rows):
+            self.render_id = self.tree.after_idle(self.render_chunk)
+        else:
+            self.finish_render()
+
+    # Inserts every pending row now instead of waiting for idle callbacks
+    def flush_render(self):
+        while self.render_id is not None:
+            self.tree.after_cancel(self.render_id)
+            self.render_chunk()
+
+    # Drops the rest of a page that is being replaced
+    def cancel_render(self):
+        if self.render_id is not None:
+            self.tree.after_cancel(self.render_id)
+            self.render_id = None
+        self.pending_rows = []
+        self.pending_index = 0
+
+    # Advances the cursor once every row of the page is in the table
+    def finish_render(self):
+        rows = self.pending_rows
+        self.pending_rows = []
+        self.pending_index = 0
+        self.loading = False
+
+        if self.tail:
+            self.drop_rows(self.pending_removed)
+            self.cursor = self.pending_cursor
+            self.pending_cursor, self.pending_removed = None, ()
+            self.exhausted = self.inserted < self.limit
+        else:
+            if rows:
+                self.cursor = self.next_cursor(self.cursor, rows)
+            self.exhausted = len(rows) < self.limit
+
+        # Render time (summed over the chunks) and row count per table (see metrics.py)
+        table = self.key or "local"
+        metrics.observe("ui_render_seconds", self.render_seconds, table=table)
+        metrics.increment("ui_rows_rendered_total", len(rows), table=table)
+
+        # Keep going if the loaded rows don't fill the visible area yet
+        if rows and self.tree.winfo_viewable():
+            self.on_scroll(*self.tree.yview())
+
+    # Offset paging: puts one changed row of the listed rows in place without refilling the table.
+    # old_index and new_index are its positions in the list before and after the change, None when
+    # it isn't (or no longer is) in it. Returns False while a page is still going in; reload then.
+    def patch_row(self, row_id, row, old_index, new_index):
+        if self.loading or not self.loaded:
+            return False
+
+        iid = str(row_id)
+        was_shown = old_index is not None and old_index < self.cursor
+        remaining = self.cursor - was_shown
+
+        # The shown rows stay the first ones of the list, so the row is shown if it lands among them
+        shown = new_index is not None and new_index <= remaining
+        if was_shown and shown:
+            self.tree.item(iid, values=self.format_row(row))
+            if new_index != old_index:
+                self.tree.move(iid, "", new_index)
+        elif was_shown:
+            self.tree.delete(iid)
+        elif shown:
+            self.tree.insert("", new_index, iid=iid, values=self.format_row(row))
+        self.cursor = remaining + shown
+        return True
+
+    # Inserts a tail row at its place in id order, or updates it if it is already shown
+    def put_row(self, row):
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.format_row(row))
+            return
+        index = bisect_left(self.ids, row[0])
+        self.ids.insert(index, row[0])
+        self.inserted += 1
+        self.tree.insert("", "end" if index == len(self.ids) - 1 else index, iid=iid, values=self.format_row(row))
+
+    # Deletes the rows with the given ids that are shown
+    def drop_rows(self, row_ids):
+        for row_id in row_ids:
+            iid = str(row_id)
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+                self.ids.remove(row_id)
+
+    def on_load_error(self, error):
+        self.loading = False
+
+        # Fall back to a full reload on the next refresh
+        self.loaded = False
+        if self.on_error:
+            self.on_error(error)
+
+    # Called by the Treeview whenever its visible window moves
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= LOAD_MORE_THRESHOLD:
+            self.load_more()
+
+
+# Creates a Treeview with a vertical scrollbar packed inside a frame
+def create_scrolled_tree(parent, columns, **tree_options):
+    frame = tk.Frame(parent)
+    tree = ttk.Treeview(frame, columns=columns, show="headings", **tree_options)
+    scrollbar = ttk.Scrollbar(frame, orient="vertical")
+    scrollbar.pack(side=tk.RIGHT, fill="y")
+    tree.pack(side=tk.LEFT, expand=True, fill="both")
+    return frame, tree, scrollbar
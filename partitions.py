@@ -0,0 +1,102 @@
+import argparse
+import gzip
+import os
+import re
+from datetime import date
+from psycopg2 import sql
+from db_pool import connection
+
+# Months of empty partitions kept ready ahead of the current one
+MONTHS_AHEAD = 3
+
+# Monthly partitions are named ledger_YYYY_MM (see migration 8 in migrations.py)
+PARTITION_NAME = re.compile(r"^ledger_(\d{4})_(\d{2})$")
+
+
+# Creates any missing monthly partitions from this month up to months_ahead months out.
+# Returns the names of the partitions created.
+def ensure_partitions(months_ahead=MONTHS_AHEAD):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT ensure_ledger_partitions(%s)", (months_ahead,))
+        return [row[0] for row in cur.fetchall()]
+
+
+# Returns (name, month, estimated_rows) for every partition attached to the ledger,
+# oldest first. month is None for ledger_default.
+def list_partitions():
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'ledger'::regclass
+            ORDER BY c.relname
+            """
+        )
+        rows = cur.fetchall()
+
+    partitions = []
+    for name, estimated_rows in rows:
+        match = PARTITION_NAME.match(name)
+        month = date(int(match.group(1)), int(match.group(2)), 1) if match else None
+        partitions.append((name, month, max(estimated_rows, 0)))
+    return partitions
+
+
+# Detaches every monthly partition that ends on or before the first day of the given month.
+# Detached months keep their table (ALTER TABLE ledger ATTACH PARTITION brings one back);
+# with dump_dir, each is also written to <dump_dir>/<name>.csv.gz and dropped.
+# Returns (name, rows dumped or None) for every partition archived.
+def archive_partitions(before, dump_dir=None):
+    before = before.replace(day=1)
+    archived = []
+
+    for name, month, _ in list_partitions():
+        if month is None or month >= before:
+            continue
+
+        # Detaching briefly locks the ledger, so it gets its own short transaction
+        with connection() as conn, conn.cursor() as cur:
+            cur.execute(sql.SQL("ALTER TABLE ledger DETACH PARTITION {}").format(sql.Identifier(name)))
+
+        if dump_dir is None:
+            archived.append((name, None))
+            continue
+
+        # Dump and drop together, so a failed dump leaves the detached table in place
+        os.makedirs(dump_dir, exist_ok=True)
+        path = os.path.join(dump_dir, f"{name}.csv.gz")
+        with connection() as conn, conn.cursor() as cur, gzip.open(path, "wt", newline="", encoding="utf-8") as file:
+            query = sql.SQL("COPY (SELECT * FROM {} ORDER BY id) TO STDOUT WITH CSV HEADER").format(sql.Identifier(name))
+            cur.copy_expert(query.as_string(conn), file)
+            count = cur.rowcount
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        archived.append((name, count))
+
+    return archived
+
+
+# Run the script (e.g. from cron) to create upcoming partitions or archive old ones
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage monthly ledger partitions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    commands.add_parser("list", help="list partitions with estimated row counts")
+    archive = commands.add_parser("archive", help="detach months before a cutoff")
+    archive.add_argument("before", type=date.fromisoformat, help="YYYY-MM-DD, months before this one are archived")
+    archive.add_argument("--dump", metavar="DIR", help="write each month to DIR/<name>.csv.gz and drop it")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        created = ensure_partitions(args.months_ahead)
+        print(f"Created partitions: {', '.join(created)}" if created else "Partitions are up to date.")
+    elif args.command == "list":
+        for name, month, estimated_rows in list_partitions():
+            print(f"{name:<20} {estimated_rows:>10} rows (estimated)")
+    else:
+        archived = archive_partitions(args.before, args.dump)
+        for name, count in archived:
+            print(f"{name}: dumped {count} rows and dropped" if count is not None else f"{name}: detached")
+        if not archived:
+            print("Nothing to archive.")
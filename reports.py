@@ -0,0 +1,93 @@
+import json
+from db import read_ledger_tail
+from db_pool import connection
+from ledger_watermark import LedgerWatermark
+
+# Days of movement shown on the reports page
+MOVEMENT_DAYS = 30
+
+# Ledger entries folded in per statement while catching up
+REFRESH_BATCH_SIZE = 10000
+
+
+# Folds ledger entries written since the last refresh into daily_movement.
+# Only new ledger ids are read, so the cost follows recent activity, not total history.
+# Entries are tracked with a LedgerWatermark instead of locking the ledger, so writers are never
+# held up and entries that commit out of id order are still folded in exactly once.
+# Returns the number of ledger entries folded in.
+def refresh_movement(batch_size=REFRESH_BATCH_SIZE):
+    count = 0
+    with connection() as conn, conn.cursor() as cur:
+
+        # Only one refresh at a time; writers never touch report_state
+        cur.execute("SELECT last_ledger_id, ledger_gaps FROM report_state WHERE id = 1 FOR UPDATE")
+        last_ledger_id, gaps = cur.fetchone()
+        watermark = LedgerWatermark(last_ledger_id, {int(gap): seen for gap, seen in gaps.items()})
+
+        while True:
+            rows, snapshot_xmin, snapshot_xmax = read_ledger_tail(cur, watermark, batch_size, columns="tail.id")
+            ids = [row[0] for row in rows]
+            watermark = watermark.advance(ids, snapshot_xmin, snapshot_xmax)
+            if ids:
+                # Units in/out per day and item from the change in quantity each entry records
+                cur.execute(
+                    """
+                    WITH new_entries AS (
+                        SELECT timestamp::date AS day, item_name,
+                               COALESCE(new_quantity, 0) - COALESCE(previous_quantity, 0) AS delta
+                        FROM ledger
+                        WHERE id = ANY(%s)
+                    )
+                    INSERT INTO daily_movement (day, item_name, units_in, units_out)
+                    SELECT day, item_name, SUM(GREATEST(delta, 0)), SUM(GREATEST(-delta, 0))
+                    FROM new_entries
+                    GROUP BY day, item_name
+                    ON CONFLICT (day, item_name) DO UPDATE
+                    SET units_in = daily_movement.units_in + EXCLUDED.units_in,
+                        units_out = daily_movement.units_out + EXCLUDED.units_out
+                    """,
+                    (ids,),
+                )
+                count += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        cur.execute(
+            "UPDATE report_state SET last_ledger_id = %s, ledger_gaps = %s WHERE id = 1",
+            (watermark.high, json.dumps({str(gap): seen for gap, seen in watermark.gaps.items()})),
+        )
+
+    return count
+
+
+# Stock value by category, read straight from the trigger-maintained aggregate
+def fetch_category_stock():
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT category, item_count, units, stock_value FROM category_stock
+            WHERE item_count > 0
+            ORDER BY stock_value DESC
+            """
+        )
+        return cur.fetchall()
+
+
+# Units in and out per day and item over the last few days, newest first
+def fetch_daily_movement(days=MOVEMENT_DAYS):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT day, item_name, units_in, units_out FROM daily_movement
+            WHERE day > CURRENT_DATE - %s
+            ORDER BY day DESC, item_name
+            """,
+            (days,),
+        )
+        return cur.fetchall()
+
+
+# Brings the movement aggregate up to date and returns everything the reports page shows
+def load_reports(days=MOVEMENT_DAYS):
+    refresh_movement()
+    return fetch_category_stock(), fetch_daily_movement(days)
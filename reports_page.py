@@ -0,0 +1,101 @@
+import tkinter as tk
+from tkinter import messagebox
+from db import PAGE_SIZE
+from paged_tree import PagedTreeview, create_scrolled_tree, next_offset
+from reports import load_reports, MOVEMENT_DAYS
+
+class ReportsPage(tk.Frame):
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+        self.controller = controller
+
+        # Title for reports page
+        label = tk.Label(self, text="Reports Page", font=("Arial", 14))
+        label.pack(pady=10, padx=10, anchor="w")
+
+        # Go to inventory button logic
+        def go_to_inventory():
+            from inventory_page import InventoryPage
+            controller.show_frame(InventoryPage)
+
+        # Go to inventory button
+        button = tk.Button(self, text="Go to Inventory Page", command=go_to_inventory, bg="blue", fg="white", width=20)
+        button.pack(pady=5, padx=10, anchor="w")
+
+        # Header with the stock total, an in-flight indicator and a refresh button
+        header_frame = tk.Frame(self)
+        header_frame.pack(pady=10, padx=10, fill="x")
+        label = tk.Label(header_frame, text="Stock Value by Category", font=("Arial", 12))
+        label.pack(side=tk.LEFT)
+        self.total_label = tk.Label(header_frame, text="")
+        self.total_label.pack(side=tk.LEFT, padx=10)
+        self.status_label = tk.Label(header_frame, text="", fg="gray")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+        refresh_button = tk.Button(header_frame, text="Refresh", command=self.load_reports, bg="gray", fg="white", width=10)
+        refresh_button.pack(side=tk.RIGHT)
+
+        # Stock by category table
+        columns = ("Category", "Items", "Units", "Value")
+        table_frame, self.category_tree, _ = create_scrolled_tree(self, columns, height=8)
+        for col in columns:
+            self.category_tree.heading(col, text=col)
+            self.category_tree.column(col, width=160, anchor="center")
+        table_frame.pack(pady=10, padx=10, fill="x")
+
+        # Daily movement table
+        label = tk.Label(self, text=f"Units In / Out per Day (last {MOVEMENT_DAYS} days)", font=("Arial", 12))
+        label.pack(pady=10, padx=10, anchor="w")
+        columns = ("Day", "Item Name", "Units In", "Units Out")
+        table_frame, self.movement_tree, scrollbar = create_scrolled_tree(self, columns)
+        for col in columns:
+            self.movement_tree.heading(col, text=col)
+            self.movement_tree.column(col, width=160, anchor="center")
+        table_frame.pack(pady=10, padx=10, expand=True, fill="both")
+
+        # Movement rows go into the table a page at a time as it is scrolled.
+        # Rows are numbered in front since day and item together make the key.
+        self.movement = []
+        self.movement_pager = PagedTreeview(
+            self.movement_tree, scrollbar, None, lambda offset, limit: self.movement[offset:offset + limit],
+            lambda row: (row[1].isoformat(), *row[2:]),
+            key="reports.movement", group=None, page_size=PAGE_SIZE, next_cursor=next_offset,
+        )
+
+        # Show the indicator while reports are loading
+        controller.worker.add_busy_listener(self.on_busy_changed)
+
+        # Reports are loaded by tkraise every time the page is shown
+
+    # Brings the aggregates up to date with new ledger entries and reads them in the background
+    # (load_reports function is defined in reports.py)
+    def load_reports(self):
+        self.controller.worker.submit(
+            load_reports, key="reports.load", group="reports",
+            on_success=self.on_reports_loaded, on_error=self.show_db_error,
+        )
+
+    # Fills both tables from the aggregate rows
+    def on_reports_loaded(self, result):
+        categories, movement = result
+
+        self.category_tree.delete(*self.category_tree.get_children())
+        for category, item_count, units, stock_value in categories:
+            self.category_tree.insert("", tk.END, values=(category, item_count, units, f"{stock_value:.2f}"))
+        total = sum(row[3] for row in categories)
+        self.total_label.config(text=f"Total: {total:.2f}")
+
+        self.movement = [(index, *row) for index, row in enumerate(movement)]
+        self.movement_pager.reload()
+
+    # Shows unexpected errors raised by a background database call
+    def show_db_error(self, error):
+        messagebox.showerror("Error", f"Database error: {error}")
+
+    # Toggles the in-flight indicator
+    def on_busy_changed(self, busy_groups):
+        self.status_label.config(text="Loading..." if "reports" in busy_groups else "")
+
+    # Refresh the reports every time the page is brought to the front
+    def tkraise(self, above_this=None):
+        self.load_reports()
+        super().tkraise(above_this)
@@ -0,0 +1,394 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import NamedTuple
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+from db_pool import connection
+
+# Rows fetched per page by list_items
+LIST_LIMIT = 200
+
+
+# One inventory row. A tuple, so it also works anywhere a plain database row does.
+class Item(NamedTuple):
+    id: int
+    name: str
+    category: str
+    quantity: int
+    price: Decimal
+    date_added: datetime
+    version: int
+
+
+# Base class for every expected failure; the message is fit to show to a user
+class InventoryError(Exception):
+    pass
+
+# Input that breaks a business rule, nothing was written
+class ValidationError(InventoryError):
+    pass
+
+class ItemNotFound(InventoryError):
+    def __init__(self, item_id):
+        super().__init__(f"Item with ID {item_id} does not exist.")
+        self.item_id = item_id
+
+class DuplicateItem(InventoryError):
+    def __init__(self, name):
+        super().__init__("Item with this name already exists!")
+        self.name = name
+
+# The item changed since expected_version was read (optimistic locking)
+class VersionConflict(InventoryError):
+    def __init__(self, item_id):
+        super().__init__("Item was changed by another user, please reload it and try again!")
+        self.item_id = item_id
+
+class InsufficientStock(InventoryError):
+    def __init__(self, item_id, on_hand):
+        super().__init__(f"Not enough stock! Only {on_hand} on hand.")
+        self.item_id = item_id
+        self.on_hand = on_hand
+
+
+# Checks the rules every new item must pass, returns an error message or None
+def validate_new_item(quantity, price):
+
+    # Validation for quantity
+    if quantity <= 0:
+        return "Quantity must be greater than 0!"
+
+    # Validation for price
+    if price <= 0:
+        return "Price must be greater than 0!"
+
+    return None
+
+
+# The InventoryError for a CHECK constraint on inventory the database rejected a write with
+def check_violation_error(error):
+    if error.diag.constraint_name == "inventory_quantity_check":
+        return ValidationError("Quantity must not be negative!")
+    return ValidationError("Price must be greater than 0!")
+
+
+# Add a batch of already validated (name, category, quantity, price) rows with one
+# multi-row statement on an open cursor, writing the matching ledger rows in bulk.
+# Names that already exist are skipped; returns the inserted rows as Items.
+def insert_items(cur, rows):
+    inserted = execute_values(
+        cur,
+        """
+        WITH new_items AS (
+            INSERT INTO inventory (name, category, quantity, price)
+            VALUES %s
+            ON CONFLICT (name) DO NOTHING
+            RETURNING *
+        ), logged AS (
+            INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price)
+            SELECT 'INSERT', id, name, category, NULL, quantity, NULL, price FROM new_items
+        )
+        SELECT id, name, category, quantity, price, date_added, version FROM new_items
+        """,
+        rows,
+        page_size=max(len(rows), 1),
+        fetch=True,
+    )
+    return [Item._make(row) for row in inserted]
+
+
+# Inventory operations without any UI: results are Items, expected failures raise
+# InventoryError subclasses and anything else (e.g. a lost connection) propagates as is.
+#
+# Each method borrows a pooled connection for one transaction. Each mutation is a single
+# statement: a data-modifying CTE changes inventory and writes the matching ledger rows from
+# the same RETURNING data, so the ledger can never disagree with the inventory write.
+# The *_many methods apply a whole batch in one statement and one round trip.
+class InventoryRepository:
+    def __init__(self, connect=connection):
+        self._connection = connect
+
+    def get(self, item_id):
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT id, name, category, quantity, price, date_added, version FROM inventory WHERE id = %s", (item_id,))
+            row = cur.fetchone()
+        if not row:
+            raise ItemNotFound(item_id)
+        return Item._make(row)
+
+    # One page of items ordered by id, starting after the given id (keyset pagination)
+    def list_items(self, after_id=0, limit=LIST_LIMIT):
+        with self._connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, name, category, quantity, price, date_added, version FROM inventory WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, limit),
+            )
+            return [Item._make(row) for row in cur.fetchall()]
+
+    def add(self, name, category, quantity, price):
+        error = validate_new_item(quantity, price)
+        if error:
+            raise ValidationError(error)
+
+        with self._connection() as conn, conn.cursor() as cur:
+            items = insert_items(cur, [(name, category, quantity, price)])
+
+        # The unique index on name makes a clash insert nothing
+        if not items:
+            raise DuplicateItem(name)
+        return items[0]
+
+    # Adds many (name, category, quantity, price) rows in one transaction.
+    # Every row is validated first; names that already exist are skipped.
+    def add_many(self, rows):
+        rows = list(rows)
+        for _, _, quantity, price in rows:
+            error = validate_new_item(quantity, price)
+            if error:
+                raise ValidationError(error)
+        if not rows:
+            return []
+
+        with self._connection() as conn, conn.cursor() as cur:
+            return insert_items(cur, rows)
+
+    # Full edit. When expected_version is given the update only applies if nobody has
+    # changed the item since it was loaded (optimistic locking), so edits are never lost.
+    def update(self, item_id, name, category, quantity, price, expected_version=None):
+        if quantity < 0:
+            raise ValidationError("Quantity must not be negative!")
+        if price <= 0:
+            raise ValidationError("Price must be greater than 0!")
+
+        with self._connection() as conn, conn.cursor() as cur:
+
+            # Locks the current row, updates it and logs the previous and new values to ledger
+            try:
+                cur.execute(
+                    """
+                    WITH updated AS (
+                        UPDATE inventory
+                        SET name = %(name)s, category = %(category)s, quantity = %(quantity)s, price = %(price)s, version = inventory.version + 1
+                        FROM (
+                            SELECT id, quantity, price FROM inventory
+                            WHERE id = %(id)s AND (%(version)s::integer IS NULL OR version = %(version)s)
+                            FOR UPDATE
+                        ) AS previous
+                        WHERE inventory.id = previous.id
+                        RETURNING inventory.*, previous.quantity AS previous_quantity, previous.price AS previous_price
+                    ), logged AS (
+                        INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price)
+                        SELECT 'UPDATE', id, name, category, previous_quantity, quantity, previous_price, price FROM updated
+                    )
+                    SELECT id, name, category, quantity, price, date_added, version FROM updated
+                    """,
+                    {"name": name, "category": category, "quantity": quantity, "price": price, "id": item_id, "version": expected_version},
+                )
+            except errors.UniqueViolation:
+                raise DuplicateItem(name) from None
+            except errors.CheckViolation as e:
+                raise check_violation_error(e) from None
+
+            row = cur.fetchone()
+
+            # Nothing updated: either the item is gone or its version moved on
+            if not row:
+                cur.execute("SELECT version FROM inventory WHERE id = %s", (item_id,))
+                if cur.fetchone():
+                    raise VersionConflict(item_id)
+                raise ItemNotFound(item_id)
+
+        return Item._make(row)
+
+    # Receive (positive delta) or pick (negative delta) stock. The new quantity is computed by
+    # the database and the non-negative check is part of the same UPDATE, so concurrent
+    # adjustments to the same item never overwrite each other.
+    def adjust(self, item_id, delta, reason=None):
+        if delta == 0:
+            raise ValidationError("Adjustment must not be zero!")
+
+        with self._connection() as conn, conn.cursor() as cur:
+
+            # Adjusts the quantity and logs the movement with its reason to ledger
+            cur.execute(
+                """
+                WITH adjusted AS (
+                    UPDATE inventory
+                    SET quantity = quantity + %(delta)s, version = version + 1
+                    WHERE id = %(id)s AND quantity + %(delta)s >= 0
+                    RETURNING *, quantity - %(delta)s AS previous_quantity
+                ), logged AS (
+                    INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price, reason)
+                    SELECT 'UPDATE', id, name, category, previous_quantity, quantity, price, price, %(reason)s FROM adjusted
+                )
+                SELECT id, name, category, quantity, price, date_added, version FROM adjusted
+                """,
+                {"id": item_id, "delta": delta, "reason": reason},
+            )
+            row = cur.fetchone()
+
+            # Nothing adjusted: either the item is gone or there isn't enough stock
+            if not row:
+                cur.execute("SELECT quantity FROM inventory WHERE id = %s", (item_id,))
+                current = cur.fetchone()
+                if current:
+                    raise InsufficientStock(item_id, current[0])
+                raise ItemNotFound(item_id)
+
+        return Item._make(row)
+
+    # Applies many (item_id, delta, reason) adjustments all or nothing. Deltas for the same
+    # item are summed into one change (reasons joined) so the batch behaves like a single
+    # adjustment per item. Returns the adjusted items.
+    def adjust_many(self, adjustments):
+        adjustments = list(adjustments)
+        if not adjustments:
+            return []
+
+        with self._connection() as conn, conn.cursor() as cur:
+            rows = execute_values(
+                cur,
+                """
+                WITH changes AS (
+                    SELECT id, SUM(delta) AS delta, string_agg(reason, '; ') AS reason
+                    FROM (VALUES %s) AS v (id, delta, reason)
+                    GROUP BY id
+                ), adjusted AS (
+                    UPDATE inventory
+                    SET quantity = inventory.quantity + changes.delta, version = inventory.version + 1
+                    FROM changes
+                    WHERE inventory.id = changes.id AND changes.delta <> 0 AND inventory.quantity + changes.delta >= 0
+                    RETURNING inventory.*, inventory.quantity - changes.delta AS previous_quantity, changes.reason
+                ), logged AS (
+                    INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price, reason)
+                    SELECT 'UPDATE', id, name, category, previous_quantity, quantity, price, price, reason FROM adjusted
+                )
+                SELECT id, name, category, quantity, price, date_added, version FROM adjusted
+                """,
+                adjustments,
+                template="(%s::integer, %s::integer, %s::varchar)",
+                page_size=len(adjustments),
+                fetch=True,
+            )
+
+            # Something was skipped: find the first item that failed and undo the whole batch
+            totals = {}
+            for item_id, delta, _ in adjustments:
+                totals[item_id] = totals.get(item_id, 0) + delta
+            expected = {item_id for item_id, delta in totals.items() if delta != 0}
+            if len(rows) < len(expected):
+                missing = sorted(expected - {row[0] for row in rows})
+                cur.execute("SELECT id, quantity FROM inventory WHERE id = ANY(%s)", (missing,))
+                on_hand = dict(cur.fetchall())
+                for item_id in missing:
+                    if item_id not in on_hand:
+                        raise ItemNotFound(item_id)
+                    raise InsufficientStock(item_id, on_hand[item_id])
+
+        return [Item._make(row) for row in rows]
+
+    # Set the category and/or price of many items; changes is a list of (item_id, category, price)
+    # where None keeps the current value. Items that no longer exist are skipped.
+    def update_many(self, changes):
+        changes = list(changes)
+        if any(price is not None and price <= 0 for _, _, price in changes):
+            raise ValidationError("Price must be greater than 0!")
+        if not changes:
+            return []
+
+        with self._connection() as conn, conn.cursor() as cur:
+
+            # Locks the rows, applies every change and logs them to ledger
+            try:
+                rows = execute_values(
+                    cur,
+                    """
+                    WITH updated AS (
+                        UPDATE inventory
+                        SET category = COALESCE(changes.category, inventory.category),
+                            price = COALESCE(changes.price, inventory.price),
+                            version = inventory.version + 1
+                        FROM (
+                            SELECT v.id, v.category, v.price, p.quantity AS previous_quantity, p.price AS previous_price
+                            FROM (VALUES %s) AS v (id, category, price)
+                            JOIN inventory AS p ON p.id = v.id
+                            FOR UPDATE OF p
+                        ) AS changes
+                        WHERE inventory.id = changes.id
+                        RETURNING inventory.*, changes.previous_quantity, changes.previous_price
+                    ), logged AS (
+                        INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price)
+                        SELECT 'UPDATE', id, name, category, previous_quantity, quantity, previous_price, price FROM updated
+                    )
+                    SELECT id, name, category, quantity, price, date_added, version FROM updated
+                    """,
+                    changes,
+                    template="(%s::integer, %s::varchar, %s::numeric)",
+                    page_size=len(changes),
+                    fetch=True,
+                )
+            except errors.CheckViolation as e:
+                raise check_violation_error(e) from None
+        return [Item._make(row) for row in rows]
+
+    # Change the price of many items by a percentage (e.g. 10 or -5), rounded to cents
+    def change_price_percent(self, item_ids, percent):
+
+        # Prices must stay above 0
+        if percent <= -100:
+            raise ValidationError("Price change must be greater than -100%!")
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+
+        with self._connection() as conn, conn.cursor() as cur:
+
+            # Reprices every item in one statement and logs each change to ledger
+            cur.execute(
+                """
+                WITH updated AS (
+                    UPDATE inventory
+                    SET price = GREATEST(ROUND(inventory.price * (1 + %(percent)s / 100.0), 2), 0.01),
+                        version = inventory.version + 1
+                    FROM (SELECT id, price FROM inventory WHERE id = ANY(%(ids)s) FOR UPDATE) AS previous
+                    WHERE inventory.id = previous.id
+                    RETURNING inventory.*, previous.price AS previous_price
+                ), logged AS (
+                    INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price)
+                    SELECT 'UPDATE', id, name, category, quantity, quantity, previous_price, price FROM updated
+                )
+                SELECT id, name, category, quantity, price, date_added, version FROM updated
+                """,
+                {"ids": item_ids, "percent": percent},
+            )
+            return [Item._make(row) for row in cur.fetchall()]
+
+    # Deletes an item, returns it as it was before the delete
+    def delete(self, item_id):
+        items = self.delete_many([item_id])
+        if not items:
+            raise ItemNotFound(item_id)
+        return items[0]
+
+    # Deletes many items at once, returns the ones that existed as they were before the delete
+    def delete_many(self, item_ids):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+
+        with self._connection() as conn, conn.cursor() as cur:
+
+            # Deletes every item and logs what each held to ledger
+            cur.execute(
+                """
+                WITH deleted AS (
+                    DELETE FROM inventory WHERE id = ANY(%s) RETURNING *
+                ), logged AS (
+                    INSERT INTO ledger (operation_type, item_id, item_name, category, previous_quantity, new_quantity, previous_price, new_price)
+                    SELECT 'DELETE', id, name, category, quantity, 0, price, 0 FROM deleted
+                )
+                SELECT id, name, category, quantity, price, date_added, version FROM deleted
+                """,
+                (item_ids,),
+            )
+            return [Item._make(row) for row in cur.fetchall()]
@@ -0,0 +1,213 @@
+import argparse
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from db import read_ledger_tail
+from db_pool import connection
+from ledger_watermark import LedgerWatermark
+
+# Take a new snapshot once this many ledger entries have been written since the last one
+SNAPSHOT_EVERY = 10000
+
+# Ledger rows fetched per round trip while replaying
+REPLAY_BATCH_SIZE = 5000
+
+# Arbitrary key for the advisory lock that stops two clients taking a snapshot at once
+SNAPSHOT_LOCK_ID = 7730002
+
+
+# Holds the snapshot lock for a with block, yielding whether it was granted (always, with wait).
+# The transaction it was taken in is ended, so the body reads data committed after the lock was
+# granted, e.g. a snapshot another client just finished. The body commits its own work.
+@contextmanager
+def _snapshot_lock(conn, cur, wait=True):
+    cur.execute("SELECT pg_advisory_lock(%s)" if wait else "SELECT pg_try_advisory_lock(%s)", (SNAPSHOT_LOCK_ID,))
+    if not wait and not cur.fetchone()[0]:
+        yield False
+        return
+    try:
+        conn.commit()
+        yield True
+    finally:
+        conn.rollback()
+        cur.execute("SELECT pg_advisory_unlock(%s)", (SNAPSHOT_LOCK_ID,))
+
+
+# Copies the inventory and records which ledger entries the copy includes, all read from one
+# REPEATABLE READ snapshot. Writers are never blocked: ledger ids up to the recorded one whose
+# writers were still running are kept as gaps (see ledger_watermark.py), and replaying picks
+# them up along with everything after it. Must start a new transaction on cur.
+def _copy_inventory(cur):
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+    # Only the ledger written since the newest snapshot has to be read
+    cur.execute("SELECT ledger_id, ledger_gaps FROM inventory_snapshots ORDER BY id DESC LIMIT 1")
+    latest = cur.fetchone()
+    watermark = LedgerWatermark()
+    if latest:
+        watermark = LedgerWatermark(latest[0], {int(gap): seen for gap, seen in latest[1].items()})
+
+    while True:
+        rows, snapshot_xmin, snapshot_xmax = read_ledger_tail(cur, watermark, REPLAY_BATCH_SIZE, columns="tail.id")
+        watermark = watermark.advance([row[0] for row in rows], snapshot_xmin, snapshot_xmax)
+        if len(rows) < REPLAY_BATCH_SIZE:
+            break
+
+    cur.execute(
+        """
+        INSERT INTO inventory_snapshots (taken_at, ledger_id, ledger_gaps)
+        VALUES (clock_timestamp(), %s, %s)
+        RETURNING id
+        """,
+        (watermark.high, json.dumps({str(gap): seen for gap, seen in watermark.gaps.items()})),
+    )
+    snapshot_id = cur.fetchone()[0]
+
+    cur.execute(
+        """
+        INSERT INTO inventory_snapshot_items (snapshot_id, item_id, name, category, quantity, price)
+        SELECT %s, id, name, category, quantity, price FROM inventory
+        """,
+        (snapshot_id,),
+    )
+    return snapshot_id, watermark.high, cur.rowcount
+
+
+# Checkpoints the current inventory together with the ledger entries it includes.
+# Returns (snapshot_id, ledger_id, item_count).
+def take_snapshot():
+    with connection() as conn, conn.cursor() as cur, _snapshot_lock(conn, cur):
+        snapshot = _copy_inventory(cur)
+        conn.commit()
+        return snapshot
+
+
+# Takes a snapshot only if enough ledger entries have piled up since the last one and no other
+# client is taking one already. Returns the new snapshot's (snapshot_id, ledger_id, item_count) or None.
+def maybe_take_snapshot(every=SNAPSHOT_EVERY):
+    with connection() as conn, conn.cursor() as cur, _snapshot_lock(conn, cur, wait=False) as locked:
+        if not locked:
+            return None
+
+        snapshot = None
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM ledger
+            WHERE id > (SELECT COALESCE(MAX(ledger_id), 0) FROM inventory_snapshots)
+            """
+        )
+        if cur.fetchone()[0] >= every:
+            conn.commit()
+            snapshot = _copy_inventory(cur)
+            conn.commit()
+        return snapshot
+
+
+# Ledger rows are matched to items by id; rows written before ledger.item_id existed
+# for items that have since been deleted or renamed can only be matched by name
+def _item_key(item_id, name):
+    return ("id", item_id) if item_id is not None else ("name", name)
+
+# Migration 6 filled in ledger.item_id by the names items had then, so an item renamed before
+# that has its older rows under the old name and the later ones under its id (or its next name).
+# When an UPDATE arrives for an item not seen yet, the name-keyed item it continues, the one
+# holding its previous quantity and price, is dropped so the item isn't counted twice. When
+# several match nothing says which one it was, and all are kept.
+def _drop_renamed(items, legacy_keys, previous_quantity, previous_price):
+    matches = [key for key in legacy_keys if items[key][3:5] == (previous_quantity, previous_price)]
+    if len(matches) == 1:
+        del items[matches[0]]
+        legacy_keys.discard(matches[0])
+
+
+# Reconstructs the inventory as it stood at a point in time. Starts from the newest
+# snapshot taken at or before that time and replays only the ledger entries after it.
+# Returns (rows, replayed) where rows are (item_id, name, category, quantity, price)
+# sorted by name and replayed is the number of ledger entries applied.
+def inventory_as_of(timestamp):
+    items = {}
+    replayed = 0
+
+    # Keys of items only known by name (see _drop_renamed)
+    legacy_keys = set()
+
+    with connection() as conn, conn.cursor() as cur:
+
+        # Nearest snapshot before the requested time, if any
+        cur.execute(
+            """
+            SELECT id, ledger_id, ledger_gaps FROM inventory_snapshots
+            WHERE taken_at <= %s
+            ORDER BY taken_at DESC
+            LIMIT 1
+            """,
+            (timestamp,),
+        )
+        snapshot = cur.fetchone()
+        ledger_id, gaps = 0, []
+
+        if snapshot:
+            snapshot_id, ledger_id, gaps = snapshot
+            gaps = [int(gap) for gap in gaps]
+            cur.execute(
+                "SELECT item_id, name, category, quantity, price FROM inventory_snapshot_items WHERE snapshot_id = %s",
+                (snapshot_id,),
+            )
+            for item_id, name, category, quantity, price in cur.fetchall():
+                items[_item_key(item_id, name)] = (item_id, name, category, quantity, price)
+
+        # Replay the ledger tail (and entries that committed after the snapshot was copied)
+        # in id order through a server-side cursor
+        with conn.cursor(name="ledger_replay") as tail:
+            tail.itersize = REPLAY_BATCH_SIZE
+            tail.execute(
+                """
+                SELECT operation_type, item_id, item_name, category, new_quantity, new_price,
+                       previous_quantity, previous_price
+                FROM ledger
+                WHERE (id > %s OR id = ANY(%s)) AND timestamp <= %s
+                ORDER BY id
+                """,
+                (ledger_id, gaps, timestamp),
+            )
+            for operation, item_id, name, category, quantity, price, previous_quantity, previous_price in tail:
+                replayed += 1
+                key = _item_key(item_id, name)
+                if operation == "UPDATE" and key not in items and legacy_keys:
+                    _drop_renamed(items, legacy_keys, previous_quantity, previous_price)
+                if operation == "DELETE":
+                    items.pop(key, None)
+                    legacy_keys.discard(key)
+                else:
+                    items[key] = (item_id, name, category, quantity, price)
+                    if item_id is None:
+                        legacy_keys.add(key)
+
+    rows = sorted(items.values(), key=lambda row: row[1])
+    return rows, replayed
+
+
+# Run the script to take snapshots (e.g. from cron) or query stock at a point in time
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory snapshots and point-in-time stock.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    take = commands.add_parser("take", help="take a snapshot now")
+    take.add_argument("--if-due", action="store_true", help=f"only if {SNAPSHOT_EVERY}+ ledger entries were written since the last one")
+    as_of = commands.add_parser("as-of", help="print the inventory at a point in time")
+    as_of.add_argument("timestamp", type=datetime.fromisoformat, help="YYYY-MM-DD[ HH:MM:SS]")
+    args = parser.parse_args()
+
+    if args.command == "take":
+        snapshot = maybe_take_snapshot() if args.if_due else take_snapshot()
+        if snapshot:
+            print(f"Snapshot {snapshot[0]} taken at ledger id {snapshot[1]} with {snapshot[2]} items")
+        else:
+            print("No snapshot needed yet.")
+    else:
+        started = time.perf_counter()
+        rows, replayed = inventory_as_of(args.timestamp)
+        for item_id, name, category, quantity, price in rows:
+            print(f"{item_id}\t{name}\t{category}\t{quantity}\t{price}")
+        total = sum(quantity * price for _, _, _, quantity, price in rows)
+        print(f"{len(rows)} items, total value {total:.2f}, replayed {replayed} ledger entries in {time.perf_counter() - started:.3f}s")
@@ -0,0 +1,48 @@
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_model import InventoryModel, sort_key
+
+
+def row(item_id, name, date_added=None, category="Tools"):
+    return (item_id, name, category, 1, Decimal("1.00"), date_added, 1)
+
+
+def ids(rows):
+    return [item.id for item in rows]
+
+
+def test_sorting_by_date_puts_missing_dates_last():
+    model = InventoryModel()
+    model.load([row(1, "a", datetime(2026, 3, 1)), row(2, "b"), row(3, "c", datetime(2026, 1, 1))])
+
+    assert ids(model.sorted_rows("date_added")) == [3, 1, 2]
+    assert ids(model.sorted_rows("date_added", descending=True)) == [2, 1, 3]
+
+
+def test_cached_sort_orders_are_patched_in_place():
+    model = InventoryModel()
+    model.load([row(1, "delta"), row(2, "alpha"), row(3, "charlie")])
+    by_name = model.sorted_rows("name")
+    by_name_descending = model.sorted_rows("name", descending=True)
+
+    model.upsert(row(4, "bravo"))
+    model.upsert(row(2, "echo"))
+    model.remove(3)
+
+    assert model.sorted_rows("name") is by_name
+    assert ids(by_name) == [4, 1, 2]
+    assert ids(by_name_descending) == [2, 1, 4]
+    assert by_name == sorted(model.rows.values(), key=sort_key("name"))
+
+
+def test_query_filters_keep_the_sort_order():
+    model = InventoryModel()
+    model.load([row(1, "bolt", category="Parts"), row(2, "brush"), row(3, "bit", category="Parts")])
+
+    assert ids(model.query("b", "Parts", "name")) == [3, 1]
+    assert ids(model.query("br")) == [2]
@@ -0,0 +1,217 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import local_store
+from ledger_watermark import LedgerWatermark
+from local_store import LOCAL_LEDGER_ID, LocalStore, SyncResult
+from repository import Item
+
+
+# Stands in for a pooled PostgreSQL connection; push only runs its own sync_applied queries on it
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+
+# Applies queued operations like the repository would, handing out server ids from 100
+class FakeRepository:
+    next_id = 100
+
+    def __init__(self, connect):
+        pass
+
+    def add(self, name, category, quantity, price):
+        FakeRepository.next_id += 1
+        return Item(FakeRepository.next_id, name, category, quantity, price, datetime(2026, 1, 1), 1)
+
+    def adjust(self, item_id, delta, reason):
+        return Item(item_id, "Widget", "Tools", 5 + delta, Decimal("2.50"), datetime(2026, 1, 1), 2)
+
+
+# A server ledger row shaped like db.fetch_ledger_tail's
+def ledger_row(ledger_id, name="Widget", item_id=1):
+    return (ledger_id, "UPDATE", name, "Tools", 1, 2, Decimal("2.50"), Decimal("2.50"), datetime(2026, 1, 1), None, item_id)
+
+
+# Serves fetch_ledger_tail from a list of server rows under a snapshot (xmin, xmax) that still has
+# a writer running; calls past fail_after raise like a lost connection
+class FakeLedger:
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.calls = 0
+        self.snapshot = (1, 2)
+
+    def __call__(self, watermark, limit):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise psycopg2.OperationalError("server closed the connection")
+        rows = [row for row in self.rows if row[0] in watermark.gaps or row[0] > watermark.high][:limit]
+        return rows, watermark.advance([row[0] for row in rows], *self.snapshot), ()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_store, "connection", contextmanager(lambda: (yield FakeConnection())))
+    monkeypatch.setattr(local_store, "InventoryRepository", FakeRepository)
+    store = LocalStore(str(tmp_path / "local.db"))
+    yield store
+    store.close()
+
+
+def server_ledger_ids(store):
+    return [row[0] for row in store._db.execute("SELECT id FROM ledger WHERE id < ? ORDER BY id", (LOCAL_LEDGER_ID,))]
+
+
+def test_mutations_queue_operations_and_pending_ledger_entries(store):
+    message, row = store.add_inventory_item("Widget", "Tools", 5, 2.5)
+    assert message == "Item added successfully!"
+    assert row[0] < 0
+
+    store.adjust_stock(row[0], 3, "restock")
+
+    assert store.pending_count() == 2
+    pending = store._db.execute("SELECT id, operation_type, new_quantity, item_id FROM ledger ORDER BY id").fetchall()
+    assert pending == [
+        (LOCAL_LEDGER_ID + 1, "INSERT", 5, row[0]),
+        (LOCAL_LEDGER_ID + 2, "UPDATE", 8, row[0]),
+    ]
+
+
+def test_push_replaces_temporary_ids_and_drops_pending_ledger_entries(store):
+    _, row = store.add_inventory_item("Widget", "Tools", 5, 2.5)
+    store.adjust_stock(row[0], 1)
+
+    result = SyncResult()
+    store.push(result)
+
+    server_id = FakeRepository.next_id
+    assert result.pushed == 2
+    assert result.ledger_rows == 2
+    assert {row[0], server_id} <= result.changed_ids
+    assert store.pending_count() == 0
+    assert [item[0] for item in store.fetch_inventory()] == [server_id]
+    assert store._db.execute("SELECT COUNT(*) FROM ledger").fetchone()[0] == 0
+
+
+def test_push_remaps_temporary_ids_of_operations_still_queued(store):
+    _, row = store.add_inventory_item("Widget", "Tools", 5, 2.5)
+    store.adjust_stock(row[0], 1)
+
+    store.push(SyncResult(), batch_size=1)
+
+    server_id = FakeRepository.next_id
+    assert store._db.execute("SELECT item_id FROM outbox").fetchall() == [(server_id,)]
+    assert store._db.execute("SELECT id, item_id FROM ledger").fetchall() == [(LOCAL_LEDGER_ID + 2, server_id)]
+
+
+def test_pull_ledger_catches_up_from_the_saved_watermark(store, monkeypatch):
+    ledger = FakeLedger([ledger_row(ledger_id) for ledger_id in (1, 2, 3, 5)])
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", ledger)
+
+    result = SyncResult()
+    store.pull_ledger(result, limit=2)
+    assert result.ledger_rows == 4
+    assert server_ledger_ids(store) == [1, 2, 3, 5]
+    assert store._ledger_watermark(store._db) == LedgerWatermark(5, {4: 2})
+
+    # Id 4 commits late; the next pull reads the gap and the new rows, nothing else
+    ledger.rows += [ledger_row(4), ledger_row(6)]
+    result = SyncResult()
+    store.pull_ledger(result, limit=2)
+    assert result.ledger_rows == 2
+    assert server_ledger_ids(store) == [1, 2, 3, 4, 5, 6]
+    assert store._ledger_watermark(store._db) == LedgerWatermark(6)
+
+
+def test_pull_ledger_raises_and_keeps_the_mirror_when_the_server_is_unreachable(store, monkeypatch):
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", FakeLedger([ledger_row(1), ledger_row(2)]))
+    store.pull_ledger(SyncResult())
+    saved = store._ledger_watermark(store._db)
+
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", FakeLedger([], fail_after=0))
+    with pytest.raises(psycopg2.OperationalError):
+        store.pull_ledger(SyncResult())
+
+    assert server_ledger_ids(store) == [1, 2]
+    assert store._ledger_watermark(store._db) == saved
+
+
+def test_legacy_mirror_is_rebuilt_only_once_every_page_arrived(store, monkeypatch):
+    # A mirror from before the watermark was kept: server rows but no saved watermark
+    store._db.executemany("INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          [local_store._local_values(ledger_row(ledger_id)) for ledger_id in (1, 3)])
+    assert store._ledger_watermark(store._db) is None
+
+    server = [ledger_row(ledger_id) for ledger_id in (1, 2, 3, 4)]
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", FakeLedger(server, fail_after=1))
+    with pytest.raises(psycopg2.OperationalError):
+        store.pull_ledger(SyncResult(), limit=2)
+    assert server_ledger_ids(store) == [1, 3]
+    assert store._ledger_watermark(store._db) is None
+
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", FakeLedger(server))
+    result = SyncResult()
+    store.pull_ledger(result, limit=2)
+    assert result.ledger_rows == 4
+    assert server_ledger_ids(store) == [1, 2, 3, 4]
+    assert store._ledger_watermark(store._db) == LedgerWatermark(4)
+
+
+def test_rolled_back_gaps_are_dropped_once_their_writers_finished(store, monkeypatch):
+    ledger = FakeLedger([ledger_row(1), ledger_row(3)])
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", ledger)
+    store.pull_ledger(SyncResult())
+    assert store._mirror_settled_id(store._db) == 1
+
+    ledger.snapshot = (2, 2)
+    store.pull_ledger(SyncResult())
+    assert store._ledger_watermark(store._db) == LedgerWatermark(3)
+    assert store._mirror_settled_id(store._db) == 3
+
+
+def test_rebuild_keeps_pending_offline_entries(store, monkeypatch):
+    store._db.execute("INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                      local_store._local_values(ledger_row(1)))
+    store.add_inventory_item("Widget", "Tools", 5, 2.5)
+
+    monkeypatch.setattr(local_store, "fetch_ledger_tail", FakeLedger([ledger_row(1), ledger_row(2)]))
+    store.pull_ledger(SyncResult())
+
+    ids = [row[0] for row in store._db.execute("SELECT id FROM ledger ORDER BY id")]
+    assert ids == [1, 2, LOCAL_LEDGER_ID + 1]
+
+
+def test_fetch_ledger_tail_reports_pending_entries_that_were_synced(store):
+    _, row = store.add_inventory_item("Widget", "Tools", 5, 2.5)
+    rows, cursor, removed = store.fetch_ledger_tail()
+    assert [entry[0] for entry in rows] == [LOCAL_LEDGER_ID + 1]
+    assert removed == frozenset()
+
+    store.push(SyncResult())
+
+    rows, cursor, removed = store.fetch_ledger_tail(cursor)
+    assert rows == []
+    assert removed == {LOCAL_LEDGER_ID + 1}
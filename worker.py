@@ -0,0 +1,151 @@
+import itertools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# How often (ms) the Tk main loop checks for finished jobs
+POLL_INTERVAL_MS = 30
+
+
+# A unit of work submitted to the DbWorker
+class Job:
+    def __init__(self, key, group, func, args, on_success, on_error):
+        self.key = key
+        self.group = group
+        self.func = func
+        self.args = args
+        self.on_success = on_success
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+
+
+# Runs blocking database calls on background threads and hands results back to
+# the Tk main loop. Tkinter is not thread safe, so worker threads only ever put
+# results on a queue which the main loop drains with after() callbacks.
+#
+# Jobs submitted with the same key supersede each other: a queued job is
+# cancelled outright, a running job has its result discarded, and any number of
+# requests made while a job is running collapse into a single follow-up run.
+# Jobs without a key always run. The optional group names the page a job
+# belongs to so it can show its own in-flight indicator.
+class DbWorker:
+    def __init__(self, root, max_workers=4):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._running = {}
+        self._pending = {}
+        self._anonymous = itertools.count()
+        self._busy_listeners = []
+        self._closed = False
+        self._after_id = self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    # Schedules func(*args) off the main thread.
+    # on_success(result) or on_error(exception) run on the main thread afterwards.
+    def submit(self, func, *args, key=None, group=None, on_success=None, on_error=None):
+        if self._closed:
+            return None
+
+        # Jobs without a key never supersede each other
+        if key is None:
+            key = ("job", next(self._anonymous))
+
+        job = Job(key, group, func, args, on_success, on_error)
+        current = self._running.get(key)
+
+        if current is None:
+            self._start(job)
+        elif current.future.cancel():
+            # The previous job hadn't started yet, so replace it outright
+            self._start(job)
+        else:
+            # The previous job is already running: drop its result and queue this one behind it
+            current.cancelled = True
+            self._pending[key] = job
+
+        return job
+
+    # Cancels the job (and any queued follow-up) registered under key
+    def cancel(self, key):
+        self._pending.pop(key, None)
+        current = self._running.get(key)
+        if current is not None:
+            current.cancelled = True
+            if current.future.cancel():
+                del self._running[key]
+                self._notify_busy()
+
+    # Returns True while a job registered under key is queued or running
+    def is_busy(self, key):
+        return key in self._running or key in self._pending
+
+    # Returns the set of groups that have queued or running jobs
+    def busy_groups(self):
+        jobs = itertools.chain(self._running.values(), self._pending.values())
+        return frozenset(job.group for job in jobs if job.group is not None)
+
+    # callback(busy_groups) is called on the main thread whenever jobs start or finish
+    def add_busy_listener(self, callback):
+        self._busy_listeners.append(callback)
+
+    def shutdown(self):
+        self._closed = True
+        self._pending.clear()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, job):
+        self._running[job.key] = job
+        job.future = self._executor.submit(self._run, job)
+        self._notify_busy()
+
+    # Runs on a worker thread
+    def _run(self, job):
+        try:
+            result = job.func(*job.args)
+        except Exception as e:
+            self._results.put((job, False, e))
+        else:
+            self._results.put((job, True, result))
+
+    # Runs on the main thread
+    def _poll(self):
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(job, ok, value)
+
+        if not self._closed:
+            self._after_id = self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _finish(self, job, ok, value):
+        if self._running.get(job.key) is job:
+            del self._running[job.key]
+
+        # Start the coalesced follow-up, if one was requested while this job ran
+        follow_up = self._pending.pop(job.key, None)
+        if follow_up is not None:
+            self._start(follow_up)
+        else:
+            self._notify_busy()
+
+        # Superseded results are thrown away
+        if job.cancelled:
+            return
+
+        if ok:
+            if job.on_success:
+                job.on_success(value)
+        elif job.on_error:
+            job.on_error(value)
+        else:
+            print(f"Background job {job.key!r} failed: {value}")
+
+    def _notify_busy(self):
+        groups = self.busy_groups()
+        for callback in self._busy_listeners:
+            callback(groups)